@@ -7,6 +7,7 @@ from backend.config import Config, init_app_config
 from .extensions import db, migrate, bcrypt, mail, cors, limiter
 from .event_stream import events as event_bus
 from .logging_config import configure_logging, setup_request_logging
+from .json_provider import init_json_provider
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 PUBLIC_DIR = PROJECT_ROOT / "frontend" / "public"
@@ -110,6 +111,7 @@ def create_app(config_object=Config) -> Flask:
 
     app.config.from_object(config_object)
     init_app_config(app)
+    init_json_provider(app)
 
     # Configure structured logging early
     configure_logging(app)
@@ -0,0 +1,40 @@
+"""Proveedor JSON de Flask respaldado por orjson (opcional)."""
+from __future__ import annotations
+
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Serializa las respuestas con orjson conservando el formato de Flask.
+
+    Las fechas pasan por ``default`` (formato HTTP, igual que ``DefaultJSONProvider``)
+    y cualquier objeto que orjson no soporte (p. ej. enteros de más de 64 bits)
+    cae al serializador estándar. La lectura de JSON sigue usando ``json``.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=kwargs.get("default", self.default), option=option).decode("utf-8")
+        except orjson.JSONEncodeError:
+            return super().dumps(obj, **kwargs)
+
+
+def init_json_provider(app) -> None:
+    """Usa ``OrjsonProvider`` si orjson está instalado; si no, deja el de Flask."""
+    if orjson is None:
+        app.logger.info("orjson no está instalado; se usa el serializador JSON estándar.")
+        return
+    app.json = OrjsonProvider(app)
@@ -2,31 +2,52 @@
 from __future__ import annotations
 
 import re
-from typing import Iterable, Optional, Set
+import uuid
+from functools import lru_cache
+from typing import FrozenSet, Iterable, Optional, Set
 
-from sqlalchemy import func, select
+from sqlalchemy import func, inspect as sa_inspect, or_, select
+from sqlalchemy.orm.attributes import set_committed_value
 
 from .extensions import db
 from .models import PlotHistory, PlotHistoryTags, Tags
 
 DEFAULT_FALLBACK_TAG = "other"
-
-_TRIG_PATTERN = re.compile(r"\b(sin|cos|tan|cot|sec|csc|asin|acos|atan|arcsin|arccos|arctan)\b", re.IGNORECASE)
-_HYPERBOLIC_PATTERN = re.compile(r"\b(sinh|cosh|tanh|coth|sech|csch|asinh|acosh|atanh)\b", re.IGNORECASE)
-_LOG_PATTERN = re.compile(r"\b(ln|log)\b", re.IGNORECASE)
+_FALLBACK_CATEGORIES = frozenset({DEFAULT_FALLBACK_TAG})
+
+# Funciones reconocidas por nombre: una sola pasada sobre las palabras de la expresión
+_KEYWORD_CATEGORIES = {
+    **dict.fromkeys(
+        ("sin", "cos", "tan", "cot", "sec", "csc", "asin", "acos", "atan", "arcsin", "arccos", "arctan"),
+        "trigonometric",
+    ),
+    **dict.fromkeys(
+        ("sinh", "cosh", "tanh", "coth", "sech", "csch", "asinh", "acosh", "atanh"),
+        "hyperbolic",
+    ),
+    **dict.fromkeys(("ln", "log"), "logarithmic"),
+}
+# Palabras no ASCII: IGNORECASE acepta equivalencias que casefold no da (p. ej. "ı" -> "i")
+_KEYWORD_FALLBACK_PATTERNS = {
+    category: re.compile("|".join(name for name, cat in _KEYWORD_CATEGORIES.items() if cat == category), re.IGNORECASE)
+    for category in set(_KEYWORD_CATEGORIES.values())
+}
+_WORD_PATTERN = re.compile(r"\w+")
 _EXP_PATTERN = re.compile(r"(\bexp\s*\(|\be\s*\^)|(\b[a-zA-Z]\s*\^\s*[a-z])|(\b\d+\s*\^\s*[a-z])", re.IGNORECASE)
 _RADICAL_PATTERN = re.compile(r"(\bsqrt\s*\(|\broot\s*\(|\^\s*\(?1\s*/\s*\d+\)?)", re.IGNORECASE)
 _PIECEWISE_PATTERN = re.compile(r"(\bpiecewise\b|\{|\}|\bif\b.*\belse\b)", re.IGNORECASE | re.DOTALL)
 _PARAMETRIC_PATTERN = re.compile(r"(\bx\s*\(\s*[a-z]\s*\)\s*=.*\by\s*\(\s*[a-z]\s*\)\s*=)|\bparam", re.IGNORECASE | re.DOTALL)
 _RATIONAL_HINT = re.compile(r"\bfrac\b|\)", re.IGNORECASE)
 
-_ALLOWED_POLY_CHARS = re.compile(r"[0-9xX\+\-\*\^\(\)\s\.]")
+_POLYNOMIAL_PATTERN = re.compile(r"[0-9xX\+\-\*\^\(\)\s\.]*")
+_NON_POLYNOMIAL_CATEGORIES = frozenset({"rational", "radical", "logarithmic", "exponential", "trigonometric", "hyperbolic"})
 
 
 def _normalize_tag_name(raw: str | None) -> str | None:
     if raw is None:
         return None
-    name = str(raw).strip().lower()
+    # strip/lower ya recorren el texto en C; sólo se evita str() cuando sobra
+    name = (raw if type(raw) is str else str(raw)).strip().lower()
     return name or None
 
 
@@ -37,31 +58,44 @@ def _extract_rhs(expression: str) -> str:
 
 def _looks_like_polynomial(expr: str) -> bool:
     expr = expr.strip()
-    if not expr:
-        return False
-    residual = _ALLOWED_POLY_CHARS.sub("", expr)
-    return residual == ""
+    return bool(expr) and _POLYNOMIAL_PATTERN.fullmatch(expr) is not None
 
 
-def classify_expression(expression: str | None) -> Set[str]:
+def classify_expression(expression: str | None) -> FrozenSet[str]:
+    """
+    Categorías de una expresión; el resultado es inmutable porque se cachea.
+    """
     text = (expression or "").strip()
     if not text:
-        return {DEFAULT_FALLBACK_TAG}
+        return _FALLBACK_CATEGORIES
+    return _classify_lowered(text.lower())
+
 
-    lower = text.lower()
+@lru_cache(maxsize=4096)
+def _classify_lowered(lower: str) -> FrozenSet[str]:
     rhs = _extract_rhs(lower)
 
     categories: Set[str] = set()
 
-    if _TRIG_PATTERN.search(lower):
-        categories.add("trigonometric")
-    if _HYPERBOLIC_PATTERN.search(lower):
-        categories.add("hyperbolic")
-    if _LOG_PATTERN.search(lower):
-        categories.add("logarithmic")
-    if _EXP_PATTERN.search(lower):
+    # Cada palabra completa equivale a un match de \b(nombre)\b
+    for word in _WORD_PATTERN.findall(lower):
+        if word.isascii():
+            category = _KEYWORD_CATEGORIES.get(word)
+            if category:
+                categories.add(category)
+        else:
+            categories.update(
+                category for category, pattern in _KEYWORD_FALLBACK_PATTERNS.items() if pattern.fullmatch(word)
+            )
+    # Prefiltro: cada patrón estructural exige ciertos literales, así que en texto
+    # ASCII su ausencia descarta la regex sin ejecutarla. Fuera de ASCII se evalúa
+    # todo porque IGNORECASE admite equivalencias como "ſ" -> "s".
+    plain = lower.isascii()
+    has_caret = "^" in lower
+
+    if (not plain or has_caret or "exp" in lower) and _EXP_PATTERN.search(lower):
         categories.add("exponential")
-    if _RADICAL_PATTERN.search(lower):
+    if (not plain or has_caret or "sqrt" in lower or "root" in lower) and _RADICAL_PATTERN.search(lower):
         categories.add("radical")
 
     if "/" in rhs:
@@ -69,25 +103,32 @@ def classify_expression(expression: str | None) -> Set[str]:
         if numerator and denominator and _looks_like_polynomial(numerator) and _looks_like_polynomial(denominator):
             categories.add("rational")
 
-    if "frac" in rhs.lower() and _RATIONAL_HINT.search(rhs):
+    if "frac" in rhs and _RATIONAL_HINT.search(rhs):
         categories.add("rational")
 
-    if _looks_like_polynomial(rhs) and not categories.intersection({"rational", "radical", "logarithmic", "exponential", "trigonometric", "hyperbolic"}):
+    if categories.isdisjoint(_NON_POLYNOMIAL_CATEGORIES) and _looks_like_polynomial(rhs):
         categories.add("polynomial")
 
-    if _PIECEWISE_PATTERN.search(lower):
+    if (not plain or "{" in lower or "}" in lower or "piecewise" in lower or "else" in lower) and _PIECEWISE_PATTERN.search(lower):
         categories.add("piecewise")
 
-    if _PARAMETRIC_PATTERN.search(lower):
+    if (not plain or "param" in lower or lower.count("=") > 1) and _PARAMETRIC_PATTERN.search(lower):
         categories.add("parametric")
 
     if not categories:
-        categories.add(DEFAULT_FALLBACK_TAG)
+        return _FALLBACK_CATEGORIES
+
+    return frozenset(categories)
 
-    return categories
 
+def _ensure_tag_objects(user_id, tag_names: Set[str], session=None, *, linked: Iterable[PlotHistoryTags] = ()) -> list[Tags]:
+    """
+    Devuelve (creando las que falten) las etiquetas del usuario para ``tag_names``,
+    en el orden de los nombres normalizados ordenados.
 
-def _ensure_tag_objects(user_id, tag_names: Set[str], session=None) -> list[Tags]:
+    Las etiquetas de las asociaciones ``linked`` se traen en la misma consulta y se
+    asignan a ``assoc.tag``, así recorrerlas no dispara un SELECT por asociación.
+    """
     session = session or db.session
     if not tag_names:
         return []
@@ -96,30 +137,35 @@ def _ensure_tag_objects(user_id, tag_names: Set[str], session=None) -> list[Tags
         return []
 
     normalized_list = sorted(normalized)
-
-    existing = (
-        session.scalars(
-            select(Tags).where(
-                Tags.user_id == user_id,
-                func.lower(Tags.name).in_(normalized_list),
-            )
-        ).all()
-        if normalized_list
-        else []
-    )
-
-    by_name = {tag.name.lower(): tag for tag in existing if tag.name}
-
-    tags: list[Tags] = []
-    for name in normalized_list:
-        tag = by_name.get(name)
-        if not tag:
-            tag = Tags(user_id=user_id, name=name)
-            session.add(tag)
-            session.flush([tag])
-            by_name[name] = tag
-        tags.append(tag)
-    return tags
+    pending = [assoc for assoc in linked if "tag" in sa_inspect(assoc).unloaded and assoc.tag_id is not None]
+
+    match = func.lower(Tags.name).in_(normalized_list)
+    if pending:
+        match = or_(match, Tags.id.in_({assoc.tag_id for assoc in pending}))
+    existing = session.scalars(select(Tags).where(Tags.user_id == user_id, match)).all()
+
+    by_id = {tag.id: tag for tag in existing}
+    for assoc in pending:
+        if assoc.tag_id in by_id:
+            set_committed_value(assoc, "tag", by_id[assoc.tag_id])
+
+    by_name = {
+        tag.name.lower(): tag
+        for tag in existing
+        if tag.name and tag.name.lower() in normalized
+    }
+
+    # Ids generados en cliente: sin RETURNING por fila, el flush inserta todo en un executemany
+    missing = [
+        Tags(id=uuid.uuid4(), user_id=user_id, name=name)
+        for name in normalized_list
+        if name not in by_name
+    ]
+    if missing:
+        session.add_all(missing)
+        session.flush(missing)
+        by_name.update((tag.name, tag) for tag in missing)
+    return [by_name[name] for name in normalized_list]
 
 
 def apply_tags_to_history(history: PlotHistory, tag_names: Iterable[str], session=None, *, replace: bool = False) -> Set[str]:
@@ -130,9 +176,12 @@ def apply_tags_to_history(history: PlotHistory, tag_names: Iterable[str], sessio
 
     attached: Set[str] = set()
 
+    associations = list(history.tags_association or [])
+    tags = _ensure_tag_objects(history.user_id, normalized, session=session, linked=associations)
+
     if replace:
         keep: Set[str] = set()
-        for assoc in list(history.tags_association or []):
+        for assoc in associations:
             assoc_name = _normalize_tag_name(getattr(getattr(assoc, "tag", None), "name", None))
             if assoc_name in normalized:
                 keep.add(assoc_name)
@@ -142,14 +191,13 @@ def apply_tags_to_history(history: PlotHistory, tag_names: Iterable[str], sessio
     else:
         existing = {
             _normalize_tag_name(assoc.tag.name)
-            for assoc in (history.tags_association or [])
+            for assoc in associations
             if assoc.tag and assoc.tag.name
         }
 
-    tags = _ensure_tag_objects(history.user_id, normalized, session=session)
-    for tag in tags:
-        tag_name = _normalize_tag_name(tag.name)
-        if not tag_name or tag_name in existing:
+    # ``tags`` sigue el orden de ``sorted(normalized)``: el nombre ya está normalizado
+    for tag_name, tag in zip(sorted(normalized), tags):
+        if tag_name in existing:
             continue
         history.tags_association.append(PlotHistoryTags(tag=tag))
         existing.add(tag_name)
@@ -13,11 +13,11 @@ from ..extensions import db
 from ..models import RequestTicket
 from ..auth import require_session
 from ..notifications import create_notification
+from ..services.validate import validate_ticket_submission as _validate_ticket_submission
 
 
 TICKET_MIN_PAGE_SIZE = 5
 TICKET_MAX_PAGE_SIZE = 20
-TICKET_ALLOWED_TYPES = {'soporte', 'rol', 'consulta', 'otro'}
 TICKET_ALLOWED_STATUS = {'pendiente', 'atendida', 'rechazada'}
 
 DASHBOARD_WIDGETS = {
@@ -194,14 +194,7 @@ def create_request_ticket():
     title = (data.get('title') or '').strip()
     description = (data.get('description') or '').strip()
 
-    errors = {}
-    if not ticket_type or ticket_type not in TICKET_ALLOWED_TYPES:
-        errors['type'] = 'Selecciona un tipo válido.'
-    if len(title) < 4:
-        errors['title'] = 'El título debe tener al menos 4 caracteres.'
-    if len(description) < 10:
-        errors['description'] = 'Describe tu solicitud con un poco más de detalle.'
-
+    errors = _validate_ticket_submission(ticket_type, title, description)
     if errors:
         return jsonify(error='Datos inválidos', fields=errors), 400
 
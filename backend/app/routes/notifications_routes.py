@@ -2,10 +2,15 @@
 
 from flask import jsonify, g, request
 
+import base64
+import binascii
+import json
 import math
+import uuid
+from datetime import datetime
 
 from flask import current_app, jsonify, request, g
-from sqlalchemy import desc
+from sqlalchemy import and_, desc, or_
 
 from . import api
 from ..extensions import db
@@ -52,6 +57,8 @@ def _notification_query_params():
     category = (args.get('category') or '').strip().lower()
     if category and category not in NOTIFICATION_CATEGORIES:
         category = ''
+    # Igual que en el historial: with_total=false evita el COUNT() de la paginación
+    with_total = str(args.get('with_total', 'true')).strip().lower() in {'1', 'true', 'yes'}
 
     return {
         'page': page,
@@ -59,9 +66,26 @@ def _notification_query_params():
         'offset': (page - 1) * page_size,
         'include_read': include_read,
         'category': category,
+        'with_total': with_total,
+        'after': (args.get('after') or '').strip(),
     }
 
 
+def _encode_notification_cursor(row):
+    """Cursor opaco (base64 de created_at + id) que apunta a la última fila entregada."""
+    raw = json.dumps([row.created_at.isoformat(), str(row.id)])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def _decode_notification_cursor(cursor):
+    """Devuelve ``(created_at, id)`` o ``None`` si el cursor no es válido."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        return None
+
+
 # ============================================================================
 # Rutas de notificaciones
 # ============================================================================
@@ -69,7 +93,15 @@ def _notification_query_params():
 @api.get("/account/notifications")
 @require_session
 def account_notifications():
-    """Lista las notificaciones del usuario con paginación y filtros."""
+    """
+    Lista las notificaciones del usuario con paginación y filtros.
+
+    Con ``with_total=false`` se omite el COUNT() y se pide una fila extra (LIMIT+1)
+    para informar ``has_more`` en lugar de ``total``/``total_pages``.
+
+    Con ``after=<meta.next_cursor>`` se pagina por keyset sobre (created_at, id):
+    no hay OFFSET ni COUNT(), así que el costo no crece con la profundidad.
+    """
     params = _notification_query_params()
     query = db.session.query(UserNotification).filter(UserNotification.user_id == g.current_user.id)
     if params['category']:
@@ -77,25 +109,47 @@ def account_notifications():
     if not params['include_read']:
         query = query.filter(UserNotification.read_at.is_(None))
 
-    total = query.count()
-    rows = (
-        query.order_by(desc(UserNotification.created_at))
-        .offset(params['offset'])
-        .limit(params['page_size'])
-        .all()
-    )
+    ordered = query.order_by(desc(UserNotification.created_at), desc(UserNotification.id))
+    page_meta = {
+        "page": params['page'],
+        "page_size": params['page_size'],
+    }
+    if params['after']:
+        cursor = _decode_notification_cursor(params['after'])
+        if cursor is None:
+            return jsonify(error="Cursor inválido."), 400
+        created_at, row_id = cursor
+        rows = (
+            ordered.filter(or_(
+                UserNotification.created_at < created_at,
+                and_(UserNotification.created_at == created_at, UserNotification.id < row_id),
+            ))
+            .limit(params['page_size'] + 1)
+            .all()
+        )
+        has_more = len(rows) > params['page_size']
+        rows = rows[:params['page_size']]
+        page_meta = {"page_size": params['page_size'], "has_more": has_more}
+    elif params['with_total']:
+        total = query.count()
+        rows = ordered.offset(params['offset']).limit(params['page_size']).all()
+        has_more = params['offset'] + len(rows) < total
+        page_meta["total"] = total
+        page_meta["total_pages"] = math.ceil(total / params['page_size']) if total else 0
+    else:
+        rows = ordered.offset(params['offset']).limit(params['page_size'] + 1).all()
+        has_more = len(rows) > params['page_size']
+        rows = rows[:params['page_size']]
+        page_meta["has_more"] = has_more
+    page_meta["next_cursor"] = _encode_notification_cursor(rows[-1]) if has_more and rows else None
 
     payload = [serialize_notification(row) for row in rows]
-    total_pages = math.ceil(total / params['page_size']) if total else 0
     categories = {key: meta.get("label", key.title()) for key, meta in NOTIFICATION_CATEGORIES.items()}
 
     return jsonify(
         data=payload,
         meta={
-            "page": params['page'],
-            "page_size": params['page_size'],
-            "total": total,
-            "total_pages": total_pages,
+            **page_meta,
             "include_read": params['include_read'],
             "category": params['category'] or None,
             "unread": count_unread(g.current_user.id),
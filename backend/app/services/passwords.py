@@ -2,22 +2,50 @@
 Servicio de validación de contraseñas.
 """
 
+import contextvars
 import hashlib
-import re
+import struct
+import threading
+import time
 import requests
-from functools import lru_cache
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from typing import Iterable
 
 from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Constantes de configuración
 HIBP_API_RANGE_URL = "https://api.pwnedpasswords.com/range/"
 HIBP_USER_AGENT = "EcuPlotPasswordChecker/1.0"
+HIBP_MAX_PARALLEL_FETCHES = 8
+HIBP_TIMEOUT = (1.0, 3.0)  # segundos: (conexión, lectura)
+HIBP_RANGE_CACHE_SIZE = 1024
+HIBP_RANGE_CACHE_TTL = 24 * 60 * 60  # segundos
 PASSWORD_POLICY_MESSAGE = (
     "La contraseña debe tener al menos 8 caracteres, con una letra mayúscula, "
     "una letra minúscula, un número y un carácter especial."
 )
 
 
+def _build_hibp_session() -> requests.Session:
+    """Sesión HTTP reutilizable: mantiene conexiones keep-alive hacia HIBP."""
+    session = requests.Session()
+    session.headers["User-Agent"] = HIBP_USER_AGENT
+    # Sólo se reintentan las respuestas 502/503/504: un HIBP inalcanzable o lento
+    # falla en el primer intento en vez de multiplicar la espera del request
+    retry = Retry(total=2, connect=0, read=0, backoff_factor=0.1, status_forcelist=(502, 503, 504))
+    session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retry))
+    return session
+
+
+_HIBP_SESSION = _build_hibp_session()
+
+
 def _log_warning(message: str, *args, **kwargs) -> None:
     """
     Helper para logging seguro con soporte para campos estructurados.
@@ -31,31 +59,139 @@ def _log_warning(message: str, *args, **kwargs) -> None:
         pass
 
 
-@lru_cache(maxsize=512)
-def hibp_fetch_range(prefix: str) -> dict[str, int]:
+# Registro empaquetado: sufijo SHA1 (35 bytes ASCII) + conteo (uint32 big-endian)
+_HIBP_RECORD = struct.Struct(">35sI")
+
+
+class _PackedRange(Mapping):
     """
-    Recupera el mapa de sufijos SHA1 -> número de apariciones desde HIBP.
-    
-    Args:
-        prefix: Primeros 5 caracteres del hash SHA1 en hexadecimal
-        
-    Returns:
-        Diccionario con sufijos (35 caracteres) como claves y conteos como valores
+    Respuesta de HIBP como mapping de solo lectura sobre un único bloque de bytes.
+
+    Los registros se guardan ordenados por sufijo (39 bytes cada uno), así que un
+    rango ocupa ~5 veces menos que un dict de str -> int y la búsqueda es binaria.
     """
-    prefix = (prefix or "").strip().upper()
-    if len(prefix) != 5 or not prefix.isalnum():
-        return {}
 
-    url = f"{HIBP_API_RANGE_URL}{prefix}"
+    __slots__ = ("_blob",)
+
+    def __init__(self, entries: dict[str, int]):
+        self._blob = b"".join(
+            _HIBP_RECORD.pack(suffix.encode("ascii"), min(count, 0xFFFFFFFF))
+            for suffix, count in sorted(entries.items())
+        )
+
+    def __len__(self) -> int:
+        return len(self._blob) // _HIBP_RECORD.size
+
+    def _suffix_at(self, index: int) -> bytes:
+        start = index * _HIBP_RECORD.size
+        return self._blob[start:start + 35]
+
+    def __getitem__(self, suffix: str) -> int:
+        try:
+            key = suffix.encode("ascii")
+        except (AttributeError, UnicodeEncodeError):
+            raise KeyError(suffix) from None
+        index = bisect_left(range(len(self)), key, key=self._suffix_at)
+        if index < len(self) and self._suffix_at(index) == key:
+            return _HIBP_RECORD.unpack_from(self._blob, index * _HIBP_RECORD.size)[1]
+        raise KeyError(suffix)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._suffix_at(index).decode("ascii")
+
+
+# Caché LRU con expiración: prefijo -> (vence_en, _PackedRange)
+_RANGE_CACHE: OrderedDict[str, tuple[float, _PackedRange]] = OrderedDict()
+_RANGE_CACHE_LOCK = threading.Lock()
+
+
+def _cached_range(prefix: str) -> _PackedRange | None:
+    with _RANGE_CACHE_LOCK:
+        entry = _RANGE_CACHE.get(prefix)
+        if entry is None:
+            return None
+        expires_at, packed = entry
+        if expires_at <= time.monotonic():
+            del _RANGE_CACHE[prefix]
+            return None
+        _RANGE_CACHE.move_to_end(prefix)
+        return packed
+
+
+def _store_range(prefix: str, packed: _PackedRange) -> None:
+    with _RANGE_CACHE_LOCK:
+        _RANGE_CACHE[prefix] = (time.monotonic() + HIBP_RANGE_CACHE_TTL, packed)
+        _RANGE_CACHE.move_to_end(prefix)
+        while len(_RANGE_CACHE) > HIBP_RANGE_CACHE_SIZE:
+            _RANGE_CACHE.popitem(last=False)
 
+
+def _clear_range_cache() -> None:
+    with _RANGE_CACHE_LOCK:
+        _RANGE_CACHE.clear()
+
+
+# Clientes Redis por URL para la caché compartida (L2) de rangos HIBP
+_SHARED_CACHE_CLIENTS: dict[str, object] = {}
+
+
+def _shared_range_cache():
+    """
+    Cliente Redis de ``HIBP_CACHE_REDIS_URL`` o ``None`` si no está configurado.
+
+    Comparte los rangos entre workers y sobrevive a reinicios; es opcional, así
+    que la falta del paquete ``redis`` sólo deja un aviso.
+    """
     try:
-        response = requests.get(
-            url,
-            headers={"User-Agent": HIBP_USER_AGENT},
-            timeout=3.0
+        url = current_app.config.get("HIBP_CACHE_REDIS_URL")
+    except RuntimeError:
+        return None
+    if not url:
+        return None
+    client = _SHARED_CACHE_CLIENTS.get(url)
+    if client is None:
+        try:
+            import redis
+        except ImportError:
+            _log_warning(
+                "redis no está instalado; se omite la caché compartida de HIBP.",
+                extra={"event": "hibp.shared_cache_unavailable"},
+            )
+            return None
+        client = _SHARED_CACHE_CLIENTS.setdefault(
+            url, redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        )
+    return client
+
+
+def _shared_cache_call(prefix: str, operation, *args):
+    """Ejecuta una operación sobre la caché compartida; cualquier fallo equivale a un miss."""
+    client = _shared_range_cache()
+    if client is None:
+        return None
+    try:
+        return getattr(client, operation)(*args)
+    except Exception as exc:
+        _log_warning(
+            "No se pudo usar la caché compartida de HIBP: %s", exc,
+            extra={
+                "event": "hibp.shared_cache_failed",
+                "prefix": prefix,
+                "error_type": type(exc).__name__,
+            }
         )
+        return None
+
+
+def _hibp_fetch_raw(prefix: str) -> str | None:
+    """Descarga el cuerpo de ``/range/<prefix>``; ``None`` si la consulta falla."""
+    url = f"{HIBP_API_RANGE_URL}{prefix}"
+
+    try:
+        response = _HIBP_SESSION.get(url, timeout=HIBP_TIMEOUT)
         response.raise_for_status()  # Lanza excepción si status >= 400
-        payload = response.text
+        return response.text
     except requests.exceptions.RequestException as exc:
         _log_warning(
             "No se pudo consultar HIBP: %s", exc,
@@ -65,7 +201,7 @@ def hibp_fetch_range(prefix: str) -> dict[str, int]:
                 "error_type": type(exc).__name__,
             }
         )
-        return {}
+        return None
     except Exception as exc:  # pragma: no cover - ruta defensiva
         _log_warning(
             "Fallo inesperado consultando HIBP: %s", exc,
@@ -75,23 +211,113 @@ def hibp_fetch_range(prefix: str) -> dict[str, int]:
                 "error_type": type(exc).__name__,
             }
         )
+        return None
+
+
+# Bytes de una respuesta canónica de HIBP: sufijos hex en mayúsculas, ':' y saltos de línea
+_HIBP_CANONICAL_BYTES = b"0123456789ABCDEF:\r\n"
+
+
+def _parse_canonical_hibp_payload(payload: str) -> dict[str, int] | None:
+    """
+    Parseo en bloque de una respuesta con el formato exacto de HIBP.
+
+    Cada paso (split, partition, int) recorre todas las líneas en C; devuelve
+    ``None`` si alguna línea se sale del formato para que decida el parseo tolerante.
+    """
+    try:
+        if payload.encode("ascii").translate(None, _HIBP_CANONICAL_BYTES):
+            return None
+    except UnicodeEncodeError:
+        return None
+    lines = payload.splitlines()
+    if not lines:
         return {}
+    suffixes, separators, counts = zip(*map(str.partition, lines, repeat(":")))
+    if "" in separators or set(map(len, suffixes)) != {35}:
+        return None
+    try:
+        return dict(zip(suffixes, map(int, counts)))
+    except ValueError:
+        return None
+
+
+def _parse_hibp_payload(payload: str) -> dict[str, int]:
+    """Convierte las líneas ``SUFIJO:CONTEO`` de HIBP en un dict, omitiendo las mal formadas."""
+    canonical = _parse_canonical_hibp_payload(payload)
+    if canonical is not None:
+        return canonical
 
     results: dict[str, int] = {}
     for line in payload.splitlines():
-        if not line or ":" not in line:
+        suffix, separator, count = line.partition(":")
+        if not separator:
             continue
-        suffix, count = line.split(":", 1)
         suffix = suffix.strip().upper()
-        if len(suffix) != 35:
+        if len(suffix) != 35 or not suffix.isascii():
             continue
         try:
-            results[suffix] = int(count.strip())
+            value = int(count)  # int() ya ignora espacios alrededor
         except ValueError:
             continue
+        if value < 0:  # _PackedRange guarda conteos sin signo
+            continue
+        results[suffix] = value
     return results
 
 
+def hibp_fetch_range(prefix: str) -> Mapping[str, int]:
+    """
+    Recupera el mapa de sufijos SHA1 -> número de apariciones desde HIBP.
+    
+    Las respuestas correctas se guardan empaquetadas en una caché acotada
+    (``HIBP_RANGE_CACHE_SIZE`` prefijos) que expira a las ``HIBP_RANGE_CACHE_TTL``;
+    si ``HIBP_CACHE_REDIS_URL`` está configurado, el texto crudo se comparte
+    además en Redis con el mismo TTL. Los fallos de red no se cachean.
+    
+    Args:
+        prefix: Primeros 5 caracteres del hash SHA1 en hexadecimal
+        
+    Returns:
+        Mapping con sufijos (35 caracteres) como claves y conteos como valores
+    """
+    prefix = (prefix or "").strip().upper()
+    if len(prefix) != 5 or not prefix.isalnum():
+        return {}
+    return _hibp_fetch_range_unchecked(prefix)
+
+
+def _hibp_fetch_range_unchecked(prefix: str) -> Mapping[str, int]:
+    """
+    Igual que ``hibp_fetch_range`` pero sin normalizar ni validar el prefijo.
+
+    Sólo para prefijos salidos de ``_sha1_hex`` (5 caracteres hexadecimales en
+    mayúsculas); comparte la misma caché que la versión pública.
+    """
+    cached = _cached_range(prefix)
+    if cached is not None:
+        return cached
+
+    shared_key = f"hibp:range:{prefix}"
+    shared = _shared_cache_call(prefix, "get", shared_key)
+    if shared is not None:
+        payload = shared.decode("utf-8") if isinstance(shared, bytes) else str(shared)
+    else:
+        payload = _hibp_fetch_raw(prefix)
+        if payload is None:
+            return {}
+        _shared_cache_call(prefix, "setex", shared_key, HIBP_RANGE_CACHE_TTL, payload)
+
+    packed = _PackedRange(_parse_hibp_payload(payload))
+    _store_range(prefix, packed)
+    return packed
+
+
+def _sha1_hex(password: str) -> str:
+    """SHA1 en hexadecimal mayúsculas, el formato de HIBP (no es un uso criptográfico)."""
+    return hashlib.sha1(password.encode("utf-8"), usedforsecurity=False).digest().hex().upper()
+
+
 def password_is_compromised(password: str, minimum_count: int) -> bool:
     """
     Verifica si una contraseña aparece en bases de datos filtradas (HIBP).
@@ -105,13 +331,95 @@ def password_is_compromised(password: str, minimum_count: int) -> bool:
     """
     if not password:
         return False
-    digest = hashlib.sha1(password.encode("utf-8")).hexdigest().upper()
+    digest = _sha1_hex(password)
     prefix, suffix = digest[:5], digest[5:]
-    matches = hibp_fetch_range(prefix)
+    matches = _hibp_fetch_range_unchecked(prefix)
     count = matches.get(suffix, 0)
     return count >= max(1, minimum_count)
 
 
+def _hibp_fetch_ranges(prefixes: set[str]) -> dict[str, dict[str, int]]:
+    """
+    Consulta varios prefijos en paralelo (un hilo por prefijo, acotado).
+
+    Cada tarea corre en una copia del contexto actual para conservar ``current_app``
+    (los avisos de ``_log_warning`` siguen llegando al logger de la app).
+    """
+    ordered = sorted(prefixes)
+    if len(ordered) <= 1:
+        return {prefix: _hibp_fetch_range_unchecked(prefix) for prefix in ordered}
+    with ThreadPoolExecutor(max_workers=min(HIBP_MAX_PARALLEL_FETCHES, len(ordered))) as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, _hibp_fetch_range_unchecked, prefix)
+            for prefix in ordered
+        ]
+        return {prefix: future.result() for prefix, future in zip(ordered, futures)}
+
+
+def password_is_compromised_many(passwords: Iterable[str], minimum_count: int) -> list[bool]:
+    """
+    Variante por lotes de ``password_is_compromised``.
+
+    Calcula todos los SHA1 primero y consulta HIBP una sola vez por prefijo
+    distinto, así que contraseñas que comparten prefijo cuestan una sola llamada.
+    Los prefijos distintos se consultan en paralelo: el lote tarda ~1 RTT, no N.
+
+    Args:
+        passwords: Contraseñas a verificar
+        minimum_count: Número mínimo de apariciones para considerar comprometida
+
+    Returns:
+        Lista de booleanos en el mismo orden que ``passwords``
+    """
+    threshold = max(1, minimum_count)
+    digests = [
+        _sha1_hex(password) if password else None
+        for password in passwords
+    ]
+    ranges = _hibp_fetch_ranges({digest[:5] for digest in digests if digest})
+    return [
+        bool(digest) and ranges[digest[:5]].get(digest[5:], 0) >= threshold
+        for digest in digests
+    ]
+
+
+# Bits de la política: mayúscula, minúscula, dígito, carácter especial
+_HAS_UPPER, _HAS_LOWER, _HAS_DIGIT, _HAS_SPECIAL = 1, 2, 4, 8
+_ALL_CLASSES = _HAS_UPPER | _HAS_LOWER | _HAS_DIGIT | _HAS_SPECIAL
+
+
+def _char_class(char: str) -> int:
+    """Bit de ``char`` con la misma semántica que ``[A-Z]``, ``[a-z]``, ``\\d`` y ``[^\\w\\s]``."""
+    if "A" <= char <= "Z":
+        return _HAS_UPPER
+    if "a" <= char <= "z":
+        return _HAS_LOWER
+    if char.isdecimal():
+        return _HAS_DIGIT
+    if not (char.isalnum() or char == "_" or char.isspace()):
+        return _HAS_SPECIAL
+    return 0
+
+
+_ASCII_CLASSES = tuple(_char_class(chr(code)) for code in range(128))
+
+
+def _password_classes(password: str) -> int:
+    """
+    Máscara con las clases de caracteres presentes en ``password``.
+
+    Una sola pasada con tabla precalculada para ASCII; corta en cuanto
+    aparecen las cuatro clases.
+    """
+    mask = 0
+    for char in password:
+        code = ord(char)
+        mask |= _ASCII_CLASSES[code] if code < 128 else _char_class(char)
+        if mask == _ALL_CLASSES:
+            break
+    return mask
+
+
 def password_strength_error(password: str | None) -> str | None:
     """
     Valida que una contraseña cumpla con la política de seguridad.
@@ -130,17 +438,9 @@ def password_strength_error(password: str | None) -> str | None:
     Returns:
         Mensaje de error si no cumple la política, None si es válida
     """
-    if not password:
-        return PASSWORD_POLICY_MESSAGE
-    if len(password) < 8:
-        return PASSWORD_POLICY_MESSAGE
-    if not re.search(r"[A-Z]", password):
-        return PASSWORD_POLICY_MESSAGE
-    if not re.search(r"[a-z]", password):
-        return PASSWORD_POLICY_MESSAGE
-    if not re.search(r"\d", password):
+    if not password or len(password) < 8:
         return PASSWORD_POLICY_MESSAGE
-    if not re.search(r"[^\w\s]", password):
+    if _password_classes(password) != _ALL_CLASSES:
         return PASSWORD_POLICY_MESSAGE
     
     # Verificación opcional contra HIBP
@@ -2,6 +2,8 @@
 Servicio de validación y normalización de datos.
 """
 
+TICKET_ALLOWED_TYPES = {'soporte', 'rol', 'consulta', 'otro'}
+
 
 def normalize_email(value):
     """
@@ -36,3 +38,25 @@ def validate_contact_submission(name, email, message):
     if len(message) < 10:
         errors['message'] = 'El mensaje debe tener al menos 10 caracteres.'
     return errors
+
+
+def validate_ticket_submission(ticket_type, title, description):
+    """
+    Valida los datos de un ticket de soporte/solicitud.
+    
+    Args:
+        ticket_type: Tipo del ticket, ya normalizado a minúsculas
+        title: Título del ticket
+        description: Descripción del ticket
+        
+    Returns:
+        Diccionario con errores de validación, vacío si todo es válido
+    """
+    errors = {}
+    if not ticket_type or ticket_type not in TICKET_ALLOWED_TYPES:
+        errors['type'] = 'Selecciona un tipo válido.'
+    if len(title) < 4:
+        errors['title'] = 'El título debe tener al menos 4 caracteres.'
+    if len(description) < 10:
+        errors['description'] = 'Describe tu solicitud con un poco más de detalle.'
+    return errors
@@ -198,6 +198,8 @@ class Config:
         _hibp_threshold = 1
     HIBP_PASSWORD_MIN_COUNT = max(1, _hibp_threshold)
     del _hibp_threshold
+    # Caché compartida opcional de rangos HIBP (p. ej. redis://localhost:6379/2)
+    HIBP_CACHE_REDIS_URL = os.getenv('HIBP_CACHE_REDIS_URL', '')
 
     # --- Rate Limiting Configuration ---
     RATELIMIT_STORAGE_URI = os.getenv('RATELIMIT_STORAGE_URI', 'memory://')
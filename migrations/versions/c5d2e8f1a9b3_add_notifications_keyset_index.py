@@ -0,0 +1,31 @@
+"""add_notifications_keyset_index
+
+Revision ID: c5d2e8f1a9b3
+Revises: 3ba8b2063bf7
+Create Date: 2025-11-20 10:00:00.000000
+
+Índice compuesto para la paginación por keyset de /api/account/notifications:
+WHERE user_id = ? AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d2e8f1a9b3'
+down_revision = '3ba8b2063bf7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_user_notifications_user_created',
+        'user_notifications',
+        ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_user_notifications_user_created', table_name='user_notifications')
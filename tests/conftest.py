@@ -5,16 +5,22 @@ import pathlib
 import importlib
 import uuid
 import ast
+import hashlib
 import inspect
 import re
+import sqlite3
 import textwrap
+from contextlib import closing
 from collections import Counter, defaultdict
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta, timezone
 from functools import lru_cache
 from typing import Optional
 
 import pytest
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import create_engine, create_mock_engine, event
+from sqlalchemy.pool import StaticPool
 
 # ---------- PATH raíz del repo ----------
 THIS = pathlib.Path(__file__).resolve()
@@ -74,8 +80,20 @@ class TestConfig:
     APP_ENV = "test"
     LOG_LEVEL = None  # Auto-detect per APP_ENV during tests
     SECRET_KEY = "testing-secret"
-    SQLALCHEMY_DATABASE_URI = "sqlite:///./test_ecuplot.sqlite"
+    # SQLite en memoria: una sola conexión compartida (StaticPool) para que todas
+    # las sesiones vean el mismo esquema y ningún commit toque disco.
+    SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "connect_args": {"check_same_thread": False},
+        "poolclass": StaticPool,
+        # La conexión compartida no debe hacer ROLLBACK al devolverse al pool:
+        # borraría la transacción externa con la que se aísla cada test.
+        "pool_reset_on_return": None,
+    }
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Coste mínimo de bcrypt (2^4 rondas): los hashes siguen siendo reales y
+    # verificables, pero registro/login/2FA no gastan ~0.3 s por contraseña
+    BCRYPT_LOG_ROUNDS = 4
     MAIL_SUPPRESS_SEND = True
     MAIL_SERVER = "localhost"
     MAIL_PORT = 1025
@@ -91,6 +109,63 @@ class TestConfig:
     RATELIMIT_CONTACT = "100 per minute"
     RATELIMIT_UNLOCK_ACCOUNT = "100 per minute"
 
+# ---------- Esquema base cacheado ----------
+SCHEMA_CACHE_DIR = ROOT / ".pytest_cache"
+
+@lru_cache(maxsize=None)
+def _schema_digest():
+    """
+    Hash del DDL de SQLite: cambia en cuanto cambia cualquier modelo.
+
+    Los CREATE INDEX salen en orden de set (varía con la aleatorización de hash
+    entre procesos), así que se ordenan las sentencias antes de hashear para que
+    todas las ejecuciones y workers de xdist compartan el mismo archivo.
+    """
+    statements = []
+    mock_engine = create_mock_engine(
+        "sqlite://", lambda sql, *a, **kw: statements.append(str(sql.compile(dialect=mock_engine.dialect)))
+    )
+    db.metadata.create_all(mock_engine, checkfirst=False)
+    return hashlib.sha256("\n".join(sorted(statements)).encode("utf-8")).hexdigest()[:16]
+
+def base_schema_path():
+    return SCHEMA_CACHE_DIR / f"base_schema_{_schema_digest()}.db"
+
+def _build_base_schema(path):
+    """Crea el archivo con el esquema completo; se reutiliza entre ejecuciones y workers."""
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    engine = create_engine(f"sqlite:///{tmp}")
+    try:
+        db.metadata.create_all(engine)
+    finally:
+        engine.dispose()
+    os.replace(tmp, path)
+    # Esquemas de modelos anteriores: ya no los reutiliza nadie
+    for stale in path.parent.glob("base_schema_*.db"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+def _restore_base_schema(engine, path):
+    """Copia el esquema cacheado a la BD de pruebas con la API de backup de SQLite."""
+    raw = engine.raw_connection()
+    try:
+        with closing(sqlite3.connect(path)) as source:
+            source.backup(raw.driver_connection)
+    finally:
+        raw.close()
+
+def pytest_configure(config):
+    global _TERMINAL_REPORTER
+    # Con pytest-xdist (`pytest -n auto`) cada worker restaura su propia BD en memoria
+    # desde este archivo; el reporte narrativo lo imprime el proceso principal.
+    # La app es de sesión: los tests cambian app.config con monkeypatch.setitem.
+    if db is not None:
+        _build_base_schema(base_schema_path())
+    _TERMINAL_REPORTER = config.pluginmanager.get_plugin("terminalreporter")
+
 @pytest.fixture(scope="session", autouse=True)
 def _clean_env():
     """
@@ -119,18 +194,28 @@ def _clean_env():
     if original_sqlalchemy_uri:
         os.environ["SQLALCHEMY_DATABASE_URI"] = original_sqlalchemy_uri
 
+@lru_cache(maxsize=None)
+def build_app(config_object=TestConfig):
+    """
+    Construye (una sola vez por clase de configuración) la app Flask de pruebas.
+
+    El registro de blueprints y extensiones es lo más caro de create_app, así que
+    cualquier fixture que necesite una app con otra configuración debe pasar por
+    aquí en lugar de llamar a create_app directamente.
+    """
+    if create_app:
+        return create_app(config_object)
+    if app_instance:
+        app_instance.config.from_object(config_object)
+        return app_instance
+    raise AttributeError(
+        "No encuentro 'create_app' ni 'app' en backend/ ni backend/app/. "
+        "Define create_app(...) en backend/__init__.py o backend/app/__init__.py"
+    )
+
 @pytest.fixture(scope="session")
 def app():
-    if create_app:
-        app = create_app(TestConfig)
-    elif app_instance:
-        app = app_instance
-        app.config.from_object(TestConfig)
-    else:
-        raise AttributeError(
-            "No encuentro 'create_app' ni 'app' en backend/ ni backend/app/. "
-            "Define create_app(...) en backend/__init__.py o backend/app/__init__.py"
-        )
+    app = build_app(TestConfig)
 
     if db is None:
         raise RuntimeError("No se pudo importar 'db' desde backend/app/extensions.py")
@@ -146,16 +231,18 @@ def app():
                 f"   Revisa TestConfig en conftest.py y la función init_app_config()."
             )
         
-        # Solo si es SQLite, proceder con drop_all (seguro)
+        # Solo si es SQLite, copiar encima el esquema base (seguro)
         if "sqlite" not in db_uri.lower():
             raise RuntimeError(
                 f"🔴 Base de datos desconocida en tests: {db_uri}\n"
                 f"   Solo se permite SQLite en tests."
             )
         
-        db.drop_all()
-        db.create_all()
-        if Roles and not db.session.execute(db.select(Roles).where(Roles.name == "user")).first():
+        _enable_sqlite_savepoints(db.engine)
+        _relax_sqlite_durability(db.engine)
+        _restore_base_schema(db.engine, base_schema_path())
+        # El esquema base llega vacío: el rol por defecto se siembra una sola vez aquí
+        if Roles:
             db.session.add(Roles(name="user", description="Default user role"))
             db.session.commit()
     yield app
@@ -164,16 +251,102 @@ def app():
         db.session.remove()
         db.drop_all()
 
+def _enable_sqlite_savepoints(engine):
+    """
+    pysqlite abre transacciones a su manera y rompe los SAVEPOINT; delegamos el
+    BEGIN en SQLAlchemy (receta oficial) para poder anidar transacciones.
+    """
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, _):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+def _relax_sqlite_durability(engine):
+    """Los datos de prueba son desechables: sin fsync ni journal en disco."""
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=MEMORY")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+class _ConnectionBoundSession(FlaskSession):
+    """Sesión que respeta ``bind``: Flask-SQLAlchemy siempre elige el engine de la app."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.bind is not None:
+            return self.bind
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+@pytest.fixture(scope="session")
+def db_connection(app):
+    """Conexión única reutilizada por todos los tests (StaticPool comparte el mismo handle)."""
+    with app.app_context():
+        connection = db.engine.connect()
+    yield connection
+    connection.close()
+
+@pytest.fixture(autouse=True)
+def db_session(request):
+    """
+    Aísla cada test que usa la app dentro de una transacción que se revierte al final.
+
+    ``db.session`` se enlaza a una conexión con una transacción externa abierta; los
+    ``commit()`` de tests y endpoints sólo liberan SAVEPOINTs, así que nada sobrevive
+    al test y el esquema se crea una única vez por sesión. Los tests marcados con
+    ``@pytest.mark.nodb`` no tocan la base y se saltan esta preparación.
+    """
+    if "app" not in request.fixturenames or request.node.get_closest_marker("nodb"):
+        yield None
+        return
+
+    app = request.getfixturevalue("app")
+    connection = request.getfixturevalue("db_connection")
+    transaction = connection.begin()
+    original_session = db.session
+    db.session = db._make_scoped_session(
+        {
+            "bind": connection,
+            "class_": _ConnectionBoundSession,
+            "join_transaction_mode": "create_savepoint",
+            "expire_on_commit": False,
+        }
+    )
+    try:
+        yield db.session
+    finally:
+        with app.app_context():
+            db.session.remove()
+        db.session = original_session
+        transaction.rollback()
+
+@pytest.fixture()
+def app_ctx(app):
+    """Mantiene un app context durante todo el test (sin ``with app.app_context()`` en el cuerpo)."""
+    with app.app_context() as ctx:
+        yield ctx
+
 @pytest.fixture()
 def client(app):
     # Use raise_server_exceptions=False para que 404, 400, etc. retornen respuestas
     # en lugar de levantar excepciones en los tests
     return app.test_client(use_cookies=True)
 
-@pytest.fixture()
+@pytest.fixture(scope="session")
 def _db(app):
+    """Extensión ``db`` ya inicializada; el aislamiento por test lo da ``db_session``."""
     return db
 
+@pytest.fixture(scope="session")
+def default_role(app):
+    """ID del rol 'user' sembrado por el fixture ``app``."""
+    with app.app_context():
+        return db.session.execute(db.select(Roles.id).where(Roles.name == "user")).scalar_one()
+
 @pytest.fixture()
 def models_ns():
     class NS: ...
@@ -185,15 +358,21 @@ def models_ns():
     n.PlotHistory = PlotHistory
     return n
 
-@pytest.fixture()
-def user_factory(app):
+@lru_cache(maxsize=None)
+def _password_hash(password):
+    """bcrypt es deliberadamente lento: cada contraseña de prueba se hashea una sola vez."""
+    return bcrypt.generate_password_hash(password).decode("utf-8")
+
+# Las fábricas sólo guardan closures sobre la app; las filas que crean viven dentro
+# de la transacción de `db_session` y se revierten al final de cada test.
+@pytest.fixture(scope="session")
+def user_factory(app, default_role):
     def _mk_user(email="u@test.com", password="Password.123", verified=True):
         if bcrypt is None:
             raise RuntimeError("Falta 'bcrypt' en extensions.")
         with app.app_context():
-            role = db.session.execute(db.select(Roles).where(Roles.name == "user")).scalar_one()
-            pwd = bcrypt.generate_password_hash(password).decode("utf-8")
-            u = Users(email=email, password_hash=pwd, role_id=role.id, is_verified=verified)
+            pwd = _password_hash(password)
+            u = Users(email=email, password_hash=pwd, role_id=default_role, is_verified=verified)
             if verified:
                 u.verified_at = datetime.now(timezone.utc)
             db.session.add(u)
@@ -201,7 +380,21 @@ def user_factory(app):
             return u
     return _mk_user
 
-@pytest.fixture()
+@pytest.fixture(scope="module")
+def shared_user(app, user_factory):
+    """
+    Usuario creado una sola vez por módulo para tests que sólo necesitan "algún" usuario.
+
+    Se confirma fuera de la transacción por test (cada test sigue revirtiendo lo que
+    cuelga de él) y se elimina, con sus dependencias en cascada, al terminar el módulo.
+    """
+    user = user_factory(email="shared@test.com")
+    yield user
+    with app.app_context():
+        db.session.delete(db.session.get(Users, user.id))
+        db.session.commit()
+
+@pytest.fixture(scope="session")
 def session_token_factory(app, user_factory):
     def _mk_session(user=None, ttl_days=7):
         with app.app_context():
@@ -225,6 +418,12 @@ def auth_headers(session_token_factory):
     token, _ = session_token_factory()
     return {"Authorization": f"Bearer {token}"}
 
+@pytest.fixture()
+def auth_client(client, auth_headers):
+    """Cliente que envía en cada request la cabecera de ``auth_headers``."""
+    client.environ_base["HTTP_AUTHORIZATION"] = auth_headers["Authorization"]
+    return client
+
 @pytest.fixture()
 def make_token(app, user_factory):
     def _mk(user=None, token_type="verify_email", ttl_hours=24):
@@ -289,13 +488,18 @@ def pytest_runtest_setup(item):
         _TERMINAL_REPORTER = item.config.pluginmanager.get_plugin("terminalreporter")
     info = _build_test_narrative(item)
     _TEST_NARRATIVES[item.nodeid] = info
+    # Viaja dentro del reporte para que xdist lo entregue al proceso principal
+    item.user_properties.append(("narrative", asdict(info)))
 
 def pytest_runtest_logreport(report):
     if report.when != "call":
         return
     info = _TEST_NARRATIVES.pop(report.nodeid, None)
     if info is None:
-        return
+        props = dict(report.user_properties)
+        if "narrative" not in props:
+            return
+        info = TestNarrative(**props["narrative"])
     outcome = {
         "passed": "PASÓ",
         "failed": "FALLÓ",
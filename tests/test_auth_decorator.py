@@ -1,3 +1,5 @@
+import pytest
+
 def test_require_session_missing_token(client):
     # /api/plot está protegido por require_session
     res = client.post("/api/plot", json={"expression": "f(x)=x"})
@@ -8,3 +10,15 @@ def test_require_session_invalid_token(client):
     res = client.post("/api/plot", headers={"Authorization": "Bearer invalid"}, json={"expression": "f(x)=x"})
     assert res.status_code == 401
     assert "Sesión inválida" in res.get_json()["error"]
+
+@pytest.mark.parametrize(
+    "method,url,kwargs,expected",
+    [
+        ("post", "/api/account/requests", {"json": {"type": "soporte", "title": "Test", "description": "Detalle suficiente."}}, {401, 403}),
+        ("get", "/api/account/2fa/status", {}, {401}),
+    ],
+    ids=["tickets", "2fa-status"],
+)
+def test_protected_endpoints_require_session(client, method, url, kwargs, expected):
+    res = getattr(client, method)(url, **kwargs)
+    assert res.status_code in expected
@@ -47,28 +47,22 @@ def test_register_conflict(client):
     assert res2.status_code == 409
 
 
-def test_register_fails_when_mail_sender_missing(client, mail_outbox):
+def test_register_fails_when_mail_sender_missing(client, mail_outbox, monkeypatch):
     app = client.application
-    original_sender = app.config.get("MAIL_DEFAULT_SENDER")
-    original_username = app.config.get("MAIL_USERNAME")
-    app.config["MAIL_DEFAULT_SENDER"] = ""
-    app.config["MAIL_USERNAME"] = ""
-
-    try:
-        payload = {
-            "email": "missing@test.com",
-            "password": "Str0ng!Pass1",
-            "password_confirm": "Str0ng!Pass1",
-            "terms": True,
-        }
-        res = client.post("/api/register", json=payload)
-        assert res.status_code == 503
-        body = res.get_json() or {}
-        assert "correo" in body.get("error", "").lower()
-        assert len(mail_outbox) == 0
-    finally:
-        app.config["MAIL_DEFAULT_SENDER"] = original_sender
-        app.config["MAIL_USERNAME"] = original_username
+    monkeypatch.setitem(app.config, "MAIL_DEFAULT_SENDER", "")
+    monkeypatch.setitem(app.config, "MAIL_USERNAME", "")
+
+    payload = {
+        "email": "missing@test.com",
+        "password": "Str0ng!Pass1",
+        "password_confirm": "Str0ng!Pass1",
+        "terms": True,
+    }
+    res = client.post("/api/register", json=payload)
+    assert res.status_code == 503
+    body = res.get_json() or {}
+    assert "correo" in body.get("error", "").lower()
+    assert len(mail_outbox) == 0
 
 def test_login_requires_verification(client, user_factory):
     u = user_factory(email="nv@test.com", verified=False)
@@ -146,6 +146,7 @@ def test_development_remove_admin_unknown_user(client, session_token_factory, us
         session = Users.query.session
         Users.query.delete()
         session.commit()
+        ensure_role('admin')
         dev_role = ensure_role('development')
         dev_user = user_factory(email='dev4@example.com')
         dev_user = _reload_user(dev_user.id)
@@ -1,5 +1,7 @@
 from datetime import datetime, timedelta, timezone
 
+from sqlalchemy import insert
+
 from backend.app.models import PlotHistory, PlotHistoryTags, Tags
 
 
@@ -37,13 +39,10 @@ def _seed_history_records(db, user, total=12):
     db.session.flush()
 
     if entries:
-        db.session.add_all(
-            [
-                PlotHistoryTags(plot_history_id=entries[0].id, tag_id=tag_trig.id),
-                PlotHistoryTags(plot_history_id=entries[1].id, tag_id=tag_trig.id),
-                PlotHistoryTags(plot_history_id=entries[2].id, tag_id=tag_algebra.id),
-                PlotHistoryTags(plot_history_id=entries[3].id, tag_id=tag_algebra.id),
-            ]
+        tagged = [(0, tag_trig.id), (1, tag_trig.id), (2, tag_algebra.id), (3, tag_algebra.id)]
+        db.session.execute(
+            insert(PlotHistoryTags),
+            [{"plot_history_id": entries[i].id, "tag_id": tag_id} for i, tag_id in tagged],
         )
         entries[-1].deleted_at = now
 
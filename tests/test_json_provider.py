@@ -0,0 +1,49 @@
+"""
+Tests para backend/app/json_provider.py
+Serialización de respuestas con orjson.
+"""
+import json
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+from backend.app.json_provider import OrjsonProvider
+
+pytestmark = pytest.mark.nodb
+
+
+def test_app_uses_orjson_provider(app):
+    """La app debe registrar el proveedor orjson cuando está instalado."""
+    assert isinstance(app.json, OrjsonProvider)
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"b": 1, "a": [1, 2.5, None, True]},
+        {"fecha": datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)},
+        {"id": uuid.UUID("12345678-1234-5678-1234-567812345678"), "monto": Decimal("1.50")},
+        {2: "dos", 1: "uno"},
+        {"texto": "ñandú"},
+        {"grande": 2 ** 70},
+    ],
+    ids=["basic", "datetime", "uuid-decimal", "int-keys", "unicode", "bigint-fallback"],
+)
+def test_dumps_matches_default_provider(app, payload):
+    """El resultado debe decodificar igual que con el proveedor de Flask."""
+    expected = DefaultJSONProvider(app).dumps(payload)
+    assert json.loads(app.json.dumps(payload)) == json.loads(expected)
+
+
+def test_dumps_sorts_keys_like_flask(app):
+    """Las claves deben salir ordenadas, como con ``sort_keys`` por defecto."""
+    assert app.json.dumps({"b": 1, "a": 2}) == '{"a":2,"b":1}'
+
+
+def test_dumps_unsupported_type_raises(app):
+    """Tipos no serializables deben seguir lanzando TypeError."""
+    with pytest.raises(TypeError):
+        app.json.dumps({"valor": object()})
@@ -3,8 +3,8 @@ Tests para backend/app/services/mail.py
 Servicio de envío de correo electrónico.
 """
 import pytest
-from unittest.mock import Mock, patch
-from flask_mail import Message
+from unittest.mock import create_autospec, patch
+from flask_mail import Mail, Message
 from backend.app.services.mail import (
     resolve_mail_sender,
     send_contact_notification,
@@ -15,120 +15,133 @@ from backend.app.services.mail import (
 class TestResolveMailSender:
     """Tests para resolve_mail_sender."""
     
-    def test_returns_mail_default_sender_if_set(self, app):
+    def test_returns_mail_default_sender_if_set(self, app, monkeypatch):
         """Debe retornar MAIL_DEFAULT_SENDER si está configurado."""
         with app.app_context():
-            app.config['MAIL_DEFAULT_SENDER'] = 'noreply@example.com'
-            app.config['MAIL_USERNAME'] = 'fallback@example.com'
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', 'noreply@example.com')
+            monkeypatch.setitem(app.config, 'MAIL_USERNAME', 'fallback@example.com')
             
             result = resolve_mail_sender()
             assert result == 'noreply@example.com'
     
-    def test_strips_whitespace_from_sender(self, app):
+    def test_strips_whitespace_from_sender(self, app, monkeypatch):
         """Debe remover espacios del sender."""
         with app.app_context():
-            app.config['MAIL_DEFAULT_SENDER'] = '  noreply@example.com  '
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', '  noreply@example.com  ')
             
             result = resolve_mail_sender()
             assert result == 'noreply@example.com'
     
-    def test_returns_tuple_sender_if_valid(self, app):
+    def test_returns_tuple_sender_if_valid(self, app, monkeypatch):
         """Debe retornar tupla (email, nombre) si está configurada."""
         with app.app_context():
-            app.config['MAIL_DEFAULT_SENDER'] = ('noreply@example.com', 'EcuPlot App')
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', ('noreply@example.com', 'EcuPlot App'))
             
             result = resolve_mail_sender()
             assert result == ('noreply@example.com', 'EcuPlot App')
     
-    def test_cleans_tuple_sender_parts(self, app):
+    def test_cleans_tuple_sender_parts(self, app, monkeypatch):
         """Debe limpiar espacios en cada parte de la tupla."""
         with app.app_context():
-            app.config['MAIL_DEFAULT_SENDER'] = ('  noreply@example.com  ', '  EcuPlot  ')
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', ('  noreply@example.com  ', '  EcuPlot  '))
             
             result = resolve_mail_sender()
             assert result == ('noreply@example.com', 'EcuPlot')
     
-    def test_handles_list_sender(self, app):
+    def test_handles_list_sender(self, app, monkeypatch):
         """Debe manejar lista como tupla."""
         with app.app_context():
-            app.config['MAIL_DEFAULT_SENDER'] = ['noreply@example.com', 'EcuPlot App']
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', ['noreply@example.com', 'EcuPlot App'])
             
             result = resolve_mail_sender()
             assert result == ('noreply@example.com', 'EcuPlot App')
     
-    def test_filters_empty_parts_from_tuple(self, app):
+    def test_filters_empty_parts_from_tuple(self, app, monkeypatch):
         """Debe filtrar partes vacías de tupla."""
         with app.app_context():
-            app.config['MAIL_DEFAULT_SENDER'] = ('noreply@example.com', '   ')
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', ('noreply@example.com', '   '))
             
             result = resolve_mail_sender()
             # Solo la parte no vacía debe quedar
             assert result == ('noreply@example.com',)
     
-    def test_returns_none_if_tuple_all_empty(self, app):
+    def test_returns_none_if_tuple_all_empty(self, app, monkeypatch):
         """Debe retornar None si tupla tiene solo elementos vacíos."""
         with app.app_context():
-            app.config['MAIL_DEFAULT_SENDER'] = ('', '  ')
-            app.config['MAIL_USERNAME'] = None
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', ('', '  '))
+            monkeypatch.setitem(app.config, 'MAIL_USERNAME', None)
             
             result = resolve_mail_sender()
             assert result is None
     
-    def test_falls_back_to_mail_username(self, app):
+    def test_falls_back_to_mail_username(self, app, monkeypatch):
         """Debe usar MAIL_USERNAME si MAIL_DEFAULT_SENDER no está."""
         with app.app_context():
-            app.config['MAIL_DEFAULT_SENDER'] = None
-            app.config['MAIL_USERNAME'] = 'username@example.com'
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', None)
+            monkeypatch.setitem(app.config, 'MAIL_USERNAME', 'username@example.com')
             
             result = resolve_mail_sender()
             assert result == 'username@example.com'
     
-    def test_falls_back_if_sender_empty_string(self, app):
+    def test_falls_back_if_sender_empty_string(self, app, monkeypatch):
         """Debe usar fallback si MAIL_DEFAULT_SENDER es string vacío."""
         with app.app_context():
-            app.config['MAIL_DEFAULT_SENDER'] = '   '
-            app.config['MAIL_USERNAME'] = 'username@example.com'
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', '   ')
+            monkeypatch.setitem(app.config, 'MAIL_USERNAME', 'username@example.com')
             
             result = resolve_mail_sender()
             assert result == 'username@example.com'
     
-    def test_strips_whitespace_from_fallback(self, app):
+    def test_strips_whitespace_from_fallback(self, app, monkeypatch):
         """Debe limpiar espacios del fallback MAIL_USERNAME."""
         with app.app_context():
-            app.config['MAIL_DEFAULT_SENDER'] = None
-            app.config['MAIL_USERNAME'] = '  username@example.com  '
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', None)
+            monkeypatch.setitem(app.config, 'MAIL_USERNAME', '  username@example.com  ')
             
             result = resolve_mail_sender()
             assert result == 'username@example.com'
     
-    def test_returns_none_if_no_sender_configured(self, app):
+    def test_returns_none_if_no_sender_configured(self, app, monkeypatch):
         """Debe retornar None si no hay remitente configurado."""
         with app.app_context():
-            app.config['MAIL_DEFAULT_SENDER'] = None
-            app.config['MAIL_USERNAME'] = None
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', None)
+            monkeypatch.setitem(app.config, 'MAIL_USERNAME', None)
             
             result = resolve_mail_sender()
             assert result is None
     
-    def test_returns_none_if_both_empty_strings(self, app):
+    def test_returns_none_if_both_empty_strings(self, app, monkeypatch):
         """Debe retornar None si ambos son strings vacíos."""
         with app.app_context():
-            app.config['MAIL_DEFAULT_SENDER'] = '   '
-            app.config['MAIL_USERNAME'] = '   '
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', '   ')
+            monkeypatch.setitem(app.config, 'MAIL_USERNAME', '   ')
             
             result = resolve_mail_sender()
             assert result is None
 
 
+@pytest.fixture(scope="module")
+def _mail_spec():
+    """Mock de Mail con spec construido una sola vez por módulo."""
+    return create_autospec(Mail, instance=True)
+
+
+@pytest.fixture()
+def mock_mail(_mail_spec):
+    """Reutiliza el mock del módulo, limpiando llamadas y side effects previos."""
+    _mail_spec.reset_mock(return_value=True, side_effect=True)
+    _mail_spec.send.side_effect = None
+    return _mail_spec
+
+
 class TestSendContactNotification:
     """Tests para send_contact_notification."""
     
-    def test_returns_none_if_no_recipient_configured(self, app):
+    def test_returns_none_if_no_recipient_configured(self, app, mock_mail, monkeypatch):
         """Debe retornar None si no hay CONTACT_RECIPIENT configurado."""
         with app.app_context():
-            app.config['CONTACT_RECIPIENT'] = None
+            monkeypatch.setitem(app.config, 'CONTACT_RECIPIENT', None)
             
-            mock_mail = Mock()
             result = send_contact_notification(
                 name="Test User",
                 email="test@example.com",
@@ -139,13 +152,12 @@ class TestSendContactNotification:
             assert result is None
             mock_mail.send.assert_not_called()
     
-    def test_logs_info_when_no_recipient(self, app):
+    def test_logs_info_when_no_recipient(self, app, mock_mail, monkeypatch):
         """Debe loggear info cuando no hay destinatario."""
         with app.app_context():
-            app.config['CONTACT_RECIPIENT'] = None
+            monkeypatch.setitem(app.config, 'CONTACT_RECIPIENT', None)
             
             with patch.object(app.logger, 'info') as mock_log:
-                mock_mail = Mock()
                 send_contact_notification(
                     name="Test User",
                     email="test@example.com",
@@ -156,14 +168,13 @@ class TestSendContactNotification:
                 mock_log.assert_called_once()
                 assert 'Test User' in str(mock_log.call_args)
     
-    def test_returns_error_if_no_sender_configured(self, app):
+    def test_returns_error_if_no_sender_configured(self, app, mock_mail, monkeypatch):
         """Debe retornar error si no hay remitente configurado."""
         with app.app_context():
-            app.config['CONTACT_RECIPIENT'] = 'admin@example.com'
-            app.config['MAIL_DEFAULT_SENDER'] = None
-            app.config['MAIL_USERNAME'] = None
+            monkeypatch.setitem(app.config, 'CONTACT_RECIPIENT', 'admin@example.com')
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', None)
+            monkeypatch.setitem(app.config, 'MAIL_USERNAME', None)
             
-            mock_mail = Mock()
             result = send_contact_notification(
                 name="Test User",
                 email="test@example.com",
@@ -174,13 +185,12 @@ class TestSendContactNotification:
             assert result == MAIL_SENDER_MISSING_ERROR
             mock_mail.send.assert_not_called()
     
-    def test_sends_email_successfully(self, app):
+    def test_sends_email_successfully(self, app, mock_mail, monkeypatch):
         """Debe enviar email exitosamente con configuración válida."""
         with app.app_context():
-            app.config['CONTACT_RECIPIENT'] = 'admin@example.com'
-            app.config['MAIL_DEFAULT_SENDER'] = 'noreply@example.com'
+            monkeypatch.setitem(app.config, 'CONTACT_RECIPIENT', 'admin@example.com')
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', 'noreply@example.com')
             
-            mock_mail = Mock()
             result = send_contact_notification(
                 name="Test User",
                 email="test@example.com",
@@ -201,13 +211,12 @@ class TestSendContactNotification:
             assert 'test@example.com' in sent_message.body
             assert 'This is a test message' in sent_message.body
     
-    def test_handles_mail_send_exception(self, app):
+    def test_handles_mail_send_exception(self, app, mock_mail, monkeypatch):
         """Debe manejar excepciones al enviar email."""
         with app.app_context():
-            app.config['CONTACT_RECIPIENT'] = 'admin@example.com'
-            app.config['MAIL_DEFAULT_SENDER'] = 'noreply@example.com'
+            monkeypatch.setitem(app.config, 'CONTACT_RECIPIENT', 'admin@example.com')
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', 'noreply@example.com')
             
-            mock_mail = Mock()
             mock_mail.send.side_effect = Exception("SMTP connection failed")
             
             result = send_contact_notification(
@@ -220,13 +229,12 @@ class TestSendContactNotification:
             assert result is not None
             assert 'No se pudo enviar el mensaje' in result
     
-    def test_logs_error_on_mail_failure(self, app):
+    def test_logs_error_on_mail_failure(self, app, mock_mail, monkeypatch):
         """Debe loggear error cuando falla el envío."""
         with app.app_context():
-            app.config['CONTACT_RECIPIENT'] = 'admin@example.com'
-            app.config['MAIL_DEFAULT_SENDER'] = 'noreply@example.com'
+            monkeypatch.setitem(app.config, 'CONTACT_RECIPIENT', 'admin@example.com')
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', 'noreply@example.com')
             
-            mock_mail = Mock()
             mock_mail.send.side_effect = Exception("SMTP error")
             
             with patch.object(app.logger, 'error') as mock_log:
@@ -240,13 +248,12 @@ class TestSendContactNotification:
                 mock_log.assert_called_once()
                 assert 'SMTP error' in str(mock_log.call_args)
     
-    def test_formats_message_body_correctly(self, app):
+    def test_formats_message_body_correctly(self, app, mock_mail, monkeypatch):
         """Debe formatear el cuerpo del mensaje correctamente."""
         with app.app_context():
-            app.config['CONTACT_RECIPIENT'] = 'admin@example.com'
-            app.config['MAIL_DEFAULT_SENDER'] = 'noreply@example.com'
+            monkeypatch.setitem(app.config, 'CONTACT_RECIPIENT', 'admin@example.com')
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', 'noreply@example.com')
             
-            mock_mail = Mock()
             send_contact_notification(
                 name="John Doe",
                 email="john@example.com",
@@ -262,13 +269,12 @@ class TestSendContactNotification:
             assert "Email: john@example.com" in body
             assert "I need help with my account" in body
     
-    def test_uses_tuple_sender_if_configured(self, app):
+    def test_uses_tuple_sender_if_configured(self, app, mock_mail, monkeypatch):
         """Debe usar sender como tupla si está configurado así."""
         with app.app_context():
-            app.config['CONTACT_RECIPIENT'] = 'admin@example.com'
-            app.config['MAIL_DEFAULT_SENDER'] = ('noreply@example.com', 'EcuPlot')
+            monkeypatch.setitem(app.config, 'CONTACT_RECIPIENT', 'admin@example.com')
+            monkeypatch.setitem(app.config, 'MAIL_DEFAULT_SENDER', ('noreply@example.com', 'EcuPlot'))
             
-            mock_mail = Mock()
             send_contact_notification(
                 name="Test User",
                 email="test@example.com",
@@ -2,7 +2,6 @@
 Tests para backend/app/routes/meta.py
 Endpoints de metadatos de la aplicación.
 """
-import pytest
 
 
 class TestMetaEnv:
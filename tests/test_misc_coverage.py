@@ -3,92 +3,85 @@ Tests adicionales para aumentar cobertura general.
 Cubre casos edge simples y rutas básicas.
 """
 import pytest
+from flask import current_app
+from sqlalchemy import inspect as sa_inspect
+
 from backend.app.extensions import db
-from backend.app.models import Tags
+from backend.app.models import Tags, Users
+
+pytestmark = pytest.mark.usefixtures("app_ctx")
+
+
+@pytest.fixture(scope="module")
+def auth(shared_user, session_token_factory):
+    """Headers compartidos por el módulo (la sesión cae junto con `shared_user`)."""
+    token, user = session_token_factory(user=shared_user)
+    return {"headers": {"Authorization": f"Bearer {token}"}, "user": user}
 
 
 class TestMiscellaneousRoutes:
     """Tests misceláneos para cobertura adicional."""
     
-    def test_api_base_exists(self, client):
-        """API debe estar montada."""
-        # Cualquier endpoint de API debería funcionar o retornar error autenticado
-        response = client.get('/api/health')
-        assert response.status_code in [200, 401]
+    @pytest.mark.parametrize(
+        ("method", "path", "allowed"),
+        [
+            # API montada: cualquier endpoint debería funcionar o retornar error autenticado
+            ("get", "/api/health", {200, 401}),
+            # Endpoint inexistente debe retornar 404
+            ("get", "/api/nonexistent_endpoint_12345", {404}),
+            # OPTIONS (CORS preflight) puede ser 200 o 204
+            ("options", "/api/health", {200, 204, 405}),
+        ],
+    )
+    def test_api_status_codes(self, client, method, path, allowed):
+        """Rutas básicas de la API deben responder con el código esperado."""
+        response = getattr(client, method)(path)
+        assert response.status_code in allowed
     
-    def test_plot_tags_basic(self, app, client, session_token_factory):
+    def test_plot_tags_basic(self, auth):
         """Sistema de tags debe funcionar básicamente."""
-        with app.app_context():
-            token, user = session_token_factory()
-            headers = {"Authorization": f"Bearer {token}"}
-
-            # Crear un tag con user_id (requerido)
-            tag = Tags(name="test_tag", user_id=user.id)
-            db.session.add(tag)
-            db.session.commit()            # El sistema debe permitir consultas
-            assert tag.name == "test_tag"
+        # Crear un tag con user_id (requerido)
+        tag = Tags(name="test_tag", user_id=auth["user"].id)
+        db.session.add(tag)
+        db.session.commit()            # El sistema debe permitir consultas
+        assert tag.name == "test_tag"
     
-    def test_user_sessions_work(self, app, client, session_token_factory):
+    def test_user_sessions_work(self, client, auth):
         """Sesiones de usuario deben funcionar."""
-        with app.app_context():
-            token, user = session_token_factory()
-            headers = {"Authorization": f"Bearer {token}"}
-            
-            # Debe poder hacer una request autenticada
-            response = client.get('/api/user/me', headers=headers)
-            assert response.status_code == 200
-            data = response.json
-            assert 'email' in data
-            assert data['email'] == user.email
-    
-    def test_invalid_api_endpoint(self, client):
-        """Endpoint inexistente debe retornar 404."""
-        response = client.get('/api/nonexistent_endpoint_12345')
-        assert response.status_code == 404
-    
-    def test_options_request_allowed(self, client):
-        """OPTIONS request debe ser permitido (CORS preflight)."""
-        response = client.options('/api/health')
-        # Puede ser 200 o 204
-        assert response.status_code in [200, 204, 405]
+        # Debe poder hacer una request autenticada
+        response = client.get('/api/user/me', headers=auth["headers"])
+        assert response.status_code == 200
+        data = response.json
+        assert 'email' in data
+        assert data['email'] == auth["user"].email
 
 
 class TestDatabaseIntegrity:
     """Tests para integridad básica de la base de datos."""
     
-    def test_user_creation_generates_id(self, app, user_factory):
+    def test_user_creation_generates_id(self, user_factory):
         """Usuario creado debe tener ID generado."""
-        with app.app_context():
-            user = user_factory()
-            assert user.id is not None
-            assert str(user.id) != ""
+        user = user_factory()
+        assert user.id is not None
+        assert str(user.id) != ""
     
-    def test_users_have_unique_emails(self, app, user_factory):
+    def test_users_have_unique_emails(self):
         """Emails deben ser únicos."""
-        with app.app_context():
-            user1 = user_factory(email="unique@example.com")
-            
-            # Intentar crear otro con mismo email debería fallar
-            try:
-                user2 = user_factory(email="unique@example.com")
-                db.session.commit()
-                # Si llegamos aquí, la constraint no funcionó
-                # pero no fallaremos el test, solo verificamos que exista constraint
-            except Exception:
-                # Expected: violación de constraint
-                pass
+        # Se inspecciona el esquema real en lugar de provocar un IntegrityError
+        inspector = sa_inspect(db.session.connection())
+        unique_columns = [uc["column_names"] for uc in inspector.get_unique_constraints("users")]
+        assert Users.__table__.c.email.unique
+        assert ["email"] in unique_columns
     
-    def test_cascade_deletes_work(self, app, user_factory):
+    def test_cascade_deletes_work(self, user_factory):
         """Deletes en cascada deben funcionar."""
-        with app.app_context():
-            user = user_factory()
-            user_id = user.id
+        user = user_factory()
+        user_id = user.id
             
-            # El usuario existe
-            from backend.app.models import Users
-            found = db.session.get(Users, user_id)
-            assert found is not None
-            assert found.email == user.email
+        # El usuario existe
+        found = db.session.get(Users, user_id)
+        assert found is not None
+        assert found.email == user.email
 
 
 class TestAppConfiguration:
@@ -96,21 +89,16 @@ class TestAppConfiguration:
     
     def test_app_has_config(self, app):
         """App debe tener configuración cargada."""
-        with app.app_context():
-            assert app.config is not None
-            assert 'TESTING' in app.config
+        assert app.config is not None
+        assert 'TESTING' in app.config
     
-    def test_database_is_configured(self, app):
+    def test_database_is_configured(self):
         """Database debe estar configurada."""
-        with app.app_context():
-            from backend.app.extensions import db
-            assert db is not None
-            # Engine debe existir
-            assert db.engine is not None
+        assert db is not None
+        # Engine debe existir
+        assert db.engine is not None
     
     def test_app_context_works(self, app):
         """App context debe funcionar correctamente."""
         assert app is not None
-        with app.app_context():
-            from flask import current_app
-            assert current_app == app
+        assert current_app == app
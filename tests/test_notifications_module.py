@@ -4,801 +4,572 @@ Sistema de notificaciones de usuario.
 """
 import pytest
 from datetime import datetime, timezone
+from sqlalchemy import insert
 from backend.app.notifications import (
     serialize_notification,
     is_category_enabled,
     count_unread,
     count_unread_by_category,
     publish_event,
+    create_notification,
+    mark_notifications_read,
+    mark_all_read,
+    update_preferences,
+    get_preferences,
     NOTIFICATION_CATEGORIES
 )
-from backend.app.models import UserNotification, NotificationPreference
+from backend.app import event_stream
+from backend.app.extensions import db
+from backend.app.models import UserNotification, NotificationPreference, Users
+
+pytestmark = pytest.mark.usefixtures("app_ctx")
+
+# Marca de lectura fija para filas cuyo read_at sólo importa por no ser NULL.
+_FIXED_READ_AT = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture()
+def captured_events(monkeypatch):
+    """Reemplaza ``events.publish`` y acumula los eventos publicados durante el test."""
+    published = []
+
+    def _publish(user_id, *, channel, event_type, data):
+        published.append({
+            'user_id': user_id,
+            'channel': channel,
+            'event_type': event_type,
+            'data': data
+        })
+
+    monkeypatch.setattr(event_stream.events, "publish", _publish)
+    return published
 
 
 class TestSerializeNotification:
     """Tests para serialize_notification."""
     
-    def test_serialize_basic_notification(self, app, user_factory, _db):
+    def test_serialize_basic_notification(self, shared_user, db_session):
         """Debe serializar notificación básica correctamente."""
-        with app.app_context():
-            user = user_factory()
-            
-            notif = UserNotification(
-                user_id=user.id,
-                category="ticket",
-                title="Test Notification",
-                body="This is a test body",
-                created_at=datetime(2025, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
-            )
-            _db.session.add(notif)
-            _db.session.commit()
-            
-            result = serialize_notification(notif)
-            
-            assert result['category'] == "ticket"
-            assert result['title'] == "Test Notification"
-            assert result['body'] == "This is a test body"
-            assert result['created_at'] == "2025-01-01T12:00:00+00:00"
-            assert result['read_at'] is None
-    
-    def test_serialize_with_payload(self, app, user_factory, _db):
+        notif = UserNotification(
+            user_id=shared_user.id,
+            category="ticket",
+            title="Test Notification",
+            body="This is a test body",
+            created_at=datetime(2025, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+        )
+        db_session.add(notif)
+        db_session.commit()
+        
+        result = serialize_notification(notif)
+        
+        expected = {
+            'category': "ticket",
+            'title': "Test Notification",
+            'body': "This is a test body",
+            'created_at': "2025-01-01T12:00:00+00:00",
+            'read_at': None,
+        }
+        assert expected.items() <= result.items()
+    
+    def test_serialize_with_payload(self, shared_user, db_session):
         """Debe serializar payload como dict."""
-        with app.app_context():
-            user = user_factory()
-            
-            notif = UserNotification(
-                user_id=user.id,
-                category="ticket",
-                title="Test",
-                body="Body",
-                payload={"ticket_id": 123, "status": "open"}
-            )
-            _db.session.add(notif)
-            _db.session.commit()
-            
-            result = serialize_notification(notif)
-            
-            assert result['payload'] == {"ticket_id": 123, "status": "open"}
-    
-    def test_serialize_read_notification(self, app, user_factory, _db):
+        notif = UserNotification(
+            user_id=shared_user.id,
+            category="ticket",
+            title="Test",
+            body="Body",
+            payload={"ticket_id": 123, "status": "open"}
+        )
+        db_session.add(notif)
+        db_session.commit()
+        
+        result = serialize_notification(notif)
+        
+        assert {'payload': {"ticket_id": 123, "status": "open"}}.items() <= result.items()
+    
+    def test_serialize_read_notification(self, shared_user, db_session):
         """Debe incluir read_at si está marcada como leída."""
-        with app.app_context():
-            user = user_factory()
-            
-            read_time = datetime(2025, 1, 2, 10, 0, 0, tzinfo=timezone.utc)
-            notif = UserNotification(
-                user_id=user.id,
-                category="reminder",
-                title="Read Notif",
-                body="Already read",
-                read_at=read_time
-            )
-            _db.session.add(notif)
-            _db.session.commit()
-            
-            result = serialize_notification(notif)
-            
-            assert result['read_at'] == "2025-01-02T10:00:00+00:00"
+        read_time = datetime(2025, 1, 2, 10, 0, 0, tzinfo=timezone.utc)
+        notif = UserNotification(
+            user_id=shared_user.id,
+            category="reminder",
+            title="Read Notif",
+            body="Already read",
+            read_at=read_time
+        )
+        db_session.add(notif)
+        db_session.commit()
+        
+        result = serialize_notification(notif)
+        
+        assert {'read_at': "2025-01-02T10:00:00+00:00"}.items() <= result.items()
 
 
 class TestIsCategoryEnabled:
     """Tests para is_category_enabled."""
     
-    def test_category_enabled_by_default(self, app, user_factory, _db):
-        """Categorías sin preferencia deben estar habilitadas por defecto."""
-        with app.app_context():
-            user = user_factory()
-            
-            result = is_category_enabled(user.id, "ticket", session=_db.session)
-            assert result is True
-    
-    def test_explicitly_enabled_category(self, app, user_factory, _db):
+    def test_explicitly_enabled_category(self, shared_user, db_session):
         """Categoría habilitada explícitamente debe retornar True."""
-        with app.app_context():
-            user = user_factory()
-            
-            pref = NotificationPreference(
-                user_id=user.id,
-                category="reminder",
-                enabled=True
-            )
-            _db.session.add(pref)
-            _db.session.commit()
-            
-            result = is_category_enabled(user.id, "reminder", session=_db.session)
-            assert result is True
-    
-    def test_explicitly_disabled_category(self, app, user_factory, _db):
+        pref = NotificationPreference(
+            user_id=shared_user.id,
+            category="reminder",
+            enabled=True
+        )
+        db_session.add(pref)
+        db_session.commit()
+        
+        result = is_category_enabled(shared_user.id, "reminder", session=db_session)
+        assert result is True
+    
+    def test_explicitly_disabled_category(self, shared_user, db_session):
         """Categoría deshabilitada explícitamente debe retornar False."""
-        with app.app_context():
-            user = user_factory()
-            
-            pref = NotificationPreference(
-                user_id=user.id,
-                category="security",
+        pref = NotificationPreference(
+            user_id=shared_user.id,
+            category="security",
+            enabled=False
+        )
+        db_session.add(pref)
+        db_session.commit()
+        
+        result = is_category_enabled(shared_user.id, "security", session=db_session)
+        assert result is False
+    
+    @pytest.mark.parametrize(
+        ("disabled_category", "category", "expected"),
+        [
+            (None, "ticket", True),
+            (None, "", True),
+            (None, None, True),
+            ("ticket", "TICKET", False),
+        ],
+        ids=["default", "empty", "none", "case-insensitive"],
+    )
+    def test_category_enabled_defaults(self, shared_user, db_session, disabled_category, category, expected):
+        """Sin preferencia (o sin categoría) se habilita; la búsqueda ignora mayúsculas."""
+        if disabled_category:
+            db_session.add(NotificationPreference(
+                user_id=shared_user.id,
+                category=disabled_category,
                 enabled=False
-            )
-            _db.session.add(pref)
-            _db.session.commit()
-            
-            result = is_category_enabled(user.id, "security", session=_db.session)
-            assert result is False
-    
-    def test_empty_category_returns_true(self, app, user_factory, _db):
-        """Categoría vacía debe retornar True."""
-        with app.app_context():
-            user = user_factory()
-            
-            result = is_category_enabled(user.id, "", session=_db.session)
-            assert result is True
-    
-    def test_none_category_returns_true(self, app, user_factory, _db):
-        """Categoría None debe retornar True."""
-        with app.app_context():
-            user = user_factory()
-            
-            result = is_category_enabled(user.id, None, session=_db.session)
-            assert result is True
-    
-    def test_case_insensitive_category(self, app, user_factory, _db):
-        """Categoría debe ser case-insensitive."""
-        with app.app_context():
-            user = user_factory()
-            
-            pref = NotificationPreference(
-                user_id=user.id,
-                category="ticket",
-                enabled=False
-            )
-            _db.session.add(pref)
-            _db.session.commit()
-            
-            result = is_category_enabled(user.id, "TICKET", session=_db.session)
-            assert result is False
+            ))
+            db_session.commit()
+        
+        result = is_category_enabled(shared_user.id, category, session=db_session)
+        assert result is expected
 
 
 class TestCountUnread:
     """Tests para count_unread."""
     
-    def test_count_unread_no_notifications(self, app, user_factory, _db):
+    def test_count_unread_no_notifications(self, shared_user, db_session):
         """Usuario sin notificaciones debe tener count 0."""
-        with app.app_context():
-            user = user_factory()
-            
-            count = count_unread(user.id, session=_db.session)
-            assert count == 0
+        count = count_unread(shared_user.id, session=db_session)
+        assert count == 0
     
-    def test_count_unread_only_read_notifications(self, app, user_factory, _db):
+    def test_count_unread_only_read_notifications(self, shared_user, db_session):
         """Usuario con solo notificaciones leídas debe tener count 0."""
-        with app.app_context():
-            user = user_factory()
-            
-            notif = UserNotification(
-                user_id=user.id,
-                category="ticket",
-                title="Read",
-                body="Body",
-                read_at=datetime.now(timezone.utc)
-            )
-            _db.session.add(notif)
-            _db.session.commit()
-            
-            count = count_unread(user.id, session=_db.session)
-            assert count == 0
-    
-    def test_count_unread_mixed_notifications(self, app, user_factory, _db):
+        notif = UserNotification(
+            user_id=shared_user.id,
+            category="ticket",
+            title="Read",
+            body="Body",
+            read_at=_FIXED_READ_AT
+        )
+        db_session.add(notif)
+        db_session.commit()
+        
+        count = count_unread(shared_user.id, session=db_session)
+        assert count == 0
+    
+    def test_count_unread_mixed_notifications(self, shared_user, db_session):
         """Debe contar solo las no leídas."""
-        with app.app_context():
-            user = user_factory()
-            
+        db_session.execute(insert(UserNotification), [
             # 2 no leídas
-            unread1 = UserNotification(
-                user_id=user.id, category="ticket", title="1", body="B"
-            )
-            unread2 = UserNotification(
-                user_id=user.id, category="reminder", title="2", body="B"
-            )
+            {"user_id": shared_user.id, "category": "ticket", "title": "1", "body": "B"},
+            {"user_id": shared_user.id, "category": "reminder", "title": "2", "body": "B"},
             # 1 leída
-            read1 = UserNotification(
-                user_id=user.id,
-                category="security",
-                title="3",
-                body="B",
-                read_at=datetime.now(timezone.utc)
-            )
-            
-            _db.session.add_all([unread1, unread2, read1])
-            _db.session.commit()
-            
-            count = count_unread(user.id, session=_db.session)
-            assert count == 2
-    
-    def test_count_unread_multiple_users(self, app, user_factory, _db):
+            {
+                "user_id": shared_user.id,
+                "category": "security",
+                "title": "3",
+                "body": "B",
+                "read_at": _FIXED_READ_AT,
+            },
+        ])
+        db_session.commit()
+        
+        count = count_unread(shared_user.id, session=db_session)
+        assert count == 2
+    
+    def test_count_unread_multiple_users(self, user_factory, db_session):
         """Debe contar solo las del usuario específico."""
-        with app.app_context():
-            user1 = user_factory(email="user1@example.com")
-            user2 = user_factory(email="user2@example.com")
-            
-            notif1 = UserNotification(
-                user_id=user1.id, category="ticket", title="U1", body="B"
-            )
-            notif2 = UserNotification(
-                user_id=user2.id, category="ticket", title="U2", body="B"
-            )
-            
-            _db.session.add_all([notif1, notif2])
-            _db.session.commit()
-            
-            count1 = count_unread(user1.id, session=_db.session)
-            count2 = count_unread(user2.id, session=_db.session)
-            
-            assert count1 == 1
-            assert count2 == 1
+        user1 = user_factory(email="user1@example.com")
+        user2 = user_factory(email="user2@example.com")
+        
+        db_session.execute(insert(UserNotification), [
+            {"user_id": user1.id, "category": "ticket", "title": "U1", "body": "B"},
+            {"user_id": user2.id, "category": "ticket", "title": "U2", "body": "B"},
+        ])
+        db_session.commit()
+        
+        count1 = count_unread(user1.id, session=db_session)
+        count2 = count_unread(user2.id, session=db_session)
+        
+        assert count1 == 1
+        assert count2 == 1
+
+
+@pytest.fixture(scope="class")
+def category_user(app, user_factory):
+    """
+    Usuario con dos tickets y un recordatorio sin leer, sembrados una vez por clase.
+
+    Las filas se confirman fuera de la transacción por test (los tests sólo consultan)
+    y se eliminan en cascada junto con el usuario al terminar la clase.
+    """
+    user = user_factory(email="categories@test.com")
+    with app.app_context():
+        db.session.execute(insert(UserNotification), [
+            {"user_id": user.id, "category": "ticket", "title": "T1", "body": "B"},
+            {"user_id": user.id, "category": "ticket", "title": "T2", "body": "B"},
+            {"user_id": user.id, "category": "reminder", "title": "R1", "body": "B"},
+        ])
+        db.session.commit()
+    yield user
+    with app.app_context():
+        db.session.delete(db.session.get(Users, user.id))
+        db.session.commit()
 
 
 class TestCountUnreadByCategory:
     """Tests para count_unread_by_category."""
     
-    def test_count_by_category_specific(self, app, user_factory, _db):
-        """Debe contar solo las de la categoría específica."""
-        with app.app_context():
-            user = user_factory()
-            
-            ticket1 = UserNotification(
-                user_id=user.id, category="ticket", title="T1", body="B"
-            )
-            ticket2 = UserNotification(
-                user_id=user.id, category="ticket", title="T2", body="B"
-            )
-            reminder = UserNotification(
-                user_id=user.id, category="reminder", title="R1", body="B"
-            )
-            
-            _db.session.add_all([ticket1, ticket2, reminder])
-            _db.session.commit()
-            
-            ticket_count = count_unread_by_category(
-                user.id, "ticket", session=_db.session
-            )
-            reminder_count = count_unread_by_category(
-                user.id, "reminder", session=_db.session
-            )
-            
-            assert ticket_count == 2
-            assert reminder_count == 1
-    
-    def test_count_by_category_empty_category(self, app, user_factory, _db):
-        """Categoría vacía debe contar todas."""
-        with app.app_context():
-            user = user_factory()
-            
-            notif1 = UserNotification(
-                user_id=user.id, category="ticket", title="1", body="B"
-            )
-            notif2 = UserNotification(
-                user_id=user.id, category="reminder", title="2", body="B"
-            )
-            
-            _db.session.add_all([notif1, notif2])
-            _db.session.commit()
-            
-            total_count = count_unread_by_category(
-                user.id, "", session=_db.session
-            )
-            assert total_count == 2
-    
-    def test_count_by_category_nonexistent(self, app, user_factory, _db):
-        """Categoría inexistente debe retornar 0."""
-        with app.app_context():
-            user = user_factory()
-            
-            notif = UserNotification(
-                user_id=user.id, category="ticket", title="1", body="B"
-            )
-            _db.session.add(notif)
-            _db.session.commit()
-            
-            count = count_unread_by_category(
-                user.id, "nonexistent", session=_db.session
-            )
-            assert count == 0
-    
-    def test_count_by_category_case_insensitive(self, app, user_factory, _db):
-        """Categoría debe ser case-insensitive."""
-        with app.app_context():
-            user = user_factory()
-            
-            notif = UserNotification(
-                user_id=user.id, category="ticket", title="1", body="B"
-            )
-            _db.session.add(notif)
-            _db.session.commit()
-            
-            count = count_unread_by_category(
-                user.id, "TICKET", session=_db.session
-            )
-            assert count == 1
+    @pytest.mark.parametrize(
+        ("category", "expected"),
+        [
+            ("ticket", 2),
+            ("reminder", 1),
+            ("", 3),
+            ("nonexistent", 0),
+            ("TICKET", 2),
+        ],
+        ids=["ticket", "reminder", "empty-counts-all", "nonexistent", "case-insensitive"],
+    )
+    def test_count_by_category(self, category_user, db_session, category, expected):
+        """Cuenta sólo la categoría pedida (sin distinguir mayúsculas); vacía cuenta todas."""
+        count = count_unread_by_category(
+            category_user.id, category, session=db_session
+        )
+        assert count == expected
 
 
 class TestPublishEvent:
     """Tests para publish_event."""
     
-    def test_publish_event_with_valid_user(self, app, user_factory, monkeypatch):
+    def test_publish_event_with_valid_user(self, shared_user, captured_events):
         """Debe publicar evento para usuario válido."""
-        with app.app_context():
-            user = user_factory()
-            
-            published_events = []
-            
-            def mock_publish(user_id, *, channel, event_type, data):
-                published_events.append({
-                    'user_id': user_id,
-                    'channel': channel,
-                    'event_type': event_type,
-                    'data': data
-                })
-            
-            from backend.app import event_stream
-            monkeypatch.setattr(event_stream.events, "publish", mock_publish)
-            
-            publish_event(
-                user.id,
-                event_type="notification:created",
-                data={"title": "Test"}
-            )
-            
-            assert len(published_events) == 1
-            assert published_events[0]['user_id'] == user.id
-            assert published_events[0]['channel'] == "notifications"
-            assert published_events[0]['event_type'] == "notification:created"
-            assert published_events[0]['data'] == {"title": "Test"}
-    
-    def test_publish_event_with_none_user_id(self, app, monkeypatch):
+        publish_event(
+            shared_user.id,
+            event_type="notification:created",
+            data={"title": "Test"}
+        )
+        
+        assert len(captured_events) == 1
+        assert captured_events[0]['user_id'] == shared_user.id
+        assert captured_events[0]['channel'] == "notifications"
+        assert captured_events[0]['event_type'] == "notification:created"
+        assert captured_events[0]['data'] == {"title": "Test"}
+    
+    @pytest.mark.nodb
+    def test_publish_event_with_none_user_id(self, captured_events):
         """Debe ignorar si user_id es None."""
-        with app.app_context():
-            published_events = []
-            
-            def mock_publish(*args, **kwargs):
-                published_events.append(True)
-            
-            from backend.app import event_stream
-            monkeypatch.setattr(event_stream.events, "publish", mock_publish)
-            
-            publish_event(
-                None,
-                event_type="test",
-                data={}
-            )
-            
-            assert len(published_events) == 0
-    
-    def test_publish_event_with_zero_user_id(self, app, monkeypatch):
+        publish_event(
+            None,
+            event_type="test",
+            data={}
+        )
+        
+        assert len(captured_events) == 0
+    
+    @pytest.mark.nodb
+    def test_publish_event_with_zero_user_id(self, captured_events):
         """Debe ignorar si user_id es 0 (falsy)."""
-        with app.app_context():
-            published_events = []
-            
-            def mock_publish(*args, **kwargs):
-                published_events.append(True)
-            
-            from backend.app import event_stream
-            monkeypatch.setattr(event_stream.events, "publish", mock_publish)
-            
-            publish_event(
-                0,
-                event_type="test",
-                data={}
-            )
-            
-            assert len(published_events) == 0
+        publish_event(
+            0,
+            event_type="test",
+            data={}
+        )
+        
+        assert len(captured_events) == 0
 
 
 class TestCreateNotification:
     """Tests para create_notification."""
     
-    def test_create_notification_basic(self, app, user_factory, _db, monkeypatch):
+    def test_create_notification_basic(self, shared_user, db_session, captured_events):
         """Debe crear notificación correctamente."""
-        with app.app_context():
-            user = user_factory()
-            
-            published_events = []
-            def mock_publish(user_id, *, channel, event_type, data):
-                published_events.append({'event_type': event_type})
-            
-            from backend.app import event_stream
-            monkeypatch.setattr(event_stream.events, "publish", mock_publish)
-            
-            from backend.app.notifications import create_notification
-            
-            notif = create_notification(
-                user.id,
-                category="ticket",
-                title="Test Notification",
-                body="Test body",
-                payload={"ticket_id": 123},
-                session=_db.session
-            )
-            
-            assert notif is not None
-            assert notif.category == "ticket"
-            assert notif.title == "Test Notification"
-            assert notif.body == "Test body"
-            assert notif.payload == {"ticket_id": 123}
-            assert len(published_events) == 1
-            assert published_events[0]['event_type'] == "notifications:new"
-    
-    def test_create_notification_disabled_category(self, app, user_factory, _db):
+        notif = create_notification(
+            shared_user.id,
+            category="ticket",
+            title="Test Notification",
+            body="Test body",
+            payload={"ticket_id": 123},
+            session=db_session
+        )
+        
+        assert notif is not None
+        assert notif.category == "ticket"
+        assert notif.title == "Test Notification"
+        assert notif.body == "Test body"
+        assert notif.payload == {"ticket_id": 123}
+        assert len(captured_events) == 1
+        assert captured_events[0]['event_type'] == "notifications:new"
+    
+    def test_create_notification_disabled_category(self, shared_user, db_session):
         """No debe crear notificación si categoría está deshabilitada."""
-        with app.app_context():
-            user = user_factory()
-            
-            pref = NotificationPreference(
-                user_id=user.id,
-                category="reminder",
-                enabled=False
-            )
-            _db.session.add(pref)
-            _db.session.commit()
-            
-            from backend.app.notifications import create_notification
-            
-            notif = create_notification(
-                user.id,
-                category="reminder",
-                title="Should not be created",
-                session=_db.session
-            )
-            
-            assert notif is None
-    
-    def test_create_notification_empty_category(self, app, user_factory, _db):
+        pref = NotificationPreference(
+            user_id=shared_user.id,
+            category="reminder",
+            enabled=False
+        )
+        db_session.add(pref)
+        db_session.commit()
+        
+        notif = create_notification(
+            shared_user.id,
+            category="reminder",
+            title="Should not be created",
+            session=db_session
+        )
+        
+        assert notif is None
+    
+    def test_create_notification_empty_category(self, shared_user, db_session):
         """No debe crear notificación con categoría vacía."""
-        with app.app_context():
-            user = user_factory()
-            
-            from backend.app.notifications import create_notification
-            
-            notif = create_notification(
-                user.id,
-                category="",
-                title="Test",
-                session=_db.session
-            )
-            
-            assert notif is None
-    
-    def test_create_notification_empty_title(self, app, user_factory, _db):
+        notif = create_notification(
+            shared_user.id,
+            category="",
+            title="Test",
+            session=db_session
+        )
+        
+        assert notif is None
+    
+    def test_create_notification_empty_title(self, shared_user, db_session):
         """No debe crear notificación sin título."""
-        with app.app_context():
-            user = user_factory()
-            
-            from backend.app.notifications import create_notification
-            
-            notif = create_notification(
-                user.id,
-                category="ticket",
-                title="",
-                session=_db.session
-            )
-            
-            assert notif is None
+        notif = create_notification(
+            shared_user.id,
+            category="ticket",
+            title="",
+            session=db_session
+        )
+        
+        assert notif is None
 
 
 class TestMarkNotificationsRead:
     """Tests para mark_notifications_read."""
     
-    def test_mark_single_notification_read(self, app, user_factory, _db, monkeypatch):
+    def test_mark_single_notification_read(self, shared_user, db_session, captured_events):
         """Debe marcar una notificación como leída."""
-        with app.app_context():
-            user = user_factory()
-            
-            notif = UserNotification(
-                user_id=user.id,
-                category="ticket",
-                title="Test",
-                body="Body"
-            )
-            _db.session.add(notif)
-            _db.session.commit()
-            
-            published_events = []
-            def mock_publish(*args, **kwargs):
-                published_events.append(True)
-            
-            from backend.app import event_stream
-            monkeypatch.setattr(event_stream.events, "publish", mock_publish)
-            
-            from backend.app.notifications import mark_notifications_read
-            
-            updated = mark_notifications_read(
-                user.id,
-                [notif.id],
-                session=_db.session
-            )
-            
-            assert updated == 1
-            _db.session.expire_all()
-            assert notif.read_at is not None
-            assert len(published_events) == 1
-    
-    def test_mark_multiple_notifications_read(self, app, user_factory, _db, monkeypatch):
+        notif = UserNotification(
+            user_id=shared_user.id,
+            category="ticket",
+            title="Test",
+            body="Body"
+        )
+        db_session.add(notif)
+        db_session.commit()
+        
+        updated = mark_notifications_read(
+            shared_user.id,
+            [notif.id],
+            session=db_session
+        )
+        
+        assert updated == 1
+        db_session.refresh(notif, attribute_names=["read_at"])
+        assert notif.read_at is not None
+        assert len(captured_events) == 1
+    
+    def test_mark_multiple_notifications_read(self, shared_user, db_session, captured_events):
         """Debe marcar múltiples notificaciones como leídas."""
-        with app.app_context():
-            user = user_factory()
-            
-            notif1 = UserNotification(
-                user_id=user.id, category="ticket", title="1", body="B"
-            )
-            notif2 = UserNotification(
-                user_id=user.id, category="reminder", title="2", body="B"
-            )
-            _db.session.add_all([notif1, notif2])
-            _db.session.commit()
-            
-            published_events = []
-            def mock_publish(*args, **kwargs):
-                published_events.append(True)
-            
-            from backend.app import event_stream
-            monkeypatch.setattr(event_stream.events, "publish", mock_publish)
-            
-            from backend.app.notifications import mark_notifications_read
-            
-            updated = mark_notifications_read(
-                user.id,
-                [notif1.id, notif2.id],
-                session=_db.session
-            )
-            
-            assert updated == 2
-    
-    def test_mark_empty_list(self, app, user_factory, _db):
+        notif1 = UserNotification(
+            user_id=shared_user.id, category="ticket", title="1", body="B"
+        )
+        notif2 = UserNotification(
+            user_id=shared_user.id, category="reminder", title="2", body="B"
+        )
+        db_session.add_all([notif1, notif2])
+        db_session.commit()
+        
+        updated = mark_notifications_read(
+            shared_user.id,
+            [notif1.id, notif2.id],
+            session=db_session
+        )
+        
+        assert updated == 2
+    
+    def test_mark_empty_list(self, shared_user, db_session):
         """No debe actualizar nada con lista vacía."""
-        with app.app_context():
-            user = user_factory()
-            
-            from backend.app.notifications import mark_notifications_read
-            
-            updated = mark_notifications_read(
-                user.id,
-                [],
-                session=_db.session
-            )
-            
-            assert updated == 0
-    
-    def test_mark_only_unread_notifications(self, app, user_factory, _db, monkeypatch):
+        updated = mark_notifications_read(
+            shared_user.id,
+            [],
+            session=db_session
+        )
+        
+        assert updated == 0
+    
+    def test_mark_only_unread_notifications(self, shared_user, db_session, captured_events):
         """Solo debe marcar las no leídas."""
-        with app.app_context():
-            user = user_factory()
-            
-            already_read = UserNotification(
-                user_id=user.id,
-                category="ticket",
-                title="Already read",
-                body="B",
-                read_at=datetime.now(timezone.utc)
-            )
-            unread = UserNotification(
-                user_id=user.id,
-                category="ticket",
-                title="Unread",
-                body="B"
-            )
-            _db.session.add_all([already_read, unread])
-            _db.session.commit()
-            
-            published_events = []
-            def mock_publish(*args, **kwargs):
-                published_events.append(True)
-            
-            from backend.app import event_stream
-            monkeypatch.setattr(event_stream.events, "publish", mock_publish)
-            
-            from backend.app.notifications import mark_notifications_read
-            
-            updated = mark_notifications_read(
-                user.id,
-                [already_read.id, unread.id],
-                session=_db.session
-            )
-            
-            assert updated == 1
+        already_read = UserNotification(
+            user_id=shared_user.id,
+            category="ticket",
+            title="Already read",
+            body="B",
+            read_at=_FIXED_READ_AT
+        )
+        unread = UserNotification(
+            user_id=shared_user.id,
+            category="ticket",
+            title="Unread",
+            body="B"
+        )
+        db_session.add_all([already_read, unread])
+        db_session.commit()
+        
+        updated = mark_notifications_read(
+            shared_user.id,
+            [already_read.id, unread.id],
+            session=db_session
+        )
+        
+        assert updated == 1
 
 
 class TestMarkAllRead:
     """Tests para mark_all_read."""
     
-    def test_mark_all_read_no_category(self, app, user_factory, _db, monkeypatch):
+    def test_mark_all_read_no_category(self, shared_user, db_session, captured_events):
         """Debe marcar todas las notificaciones como leídas."""
-        with app.app_context():
-            user = user_factory()
-            
-            notif1 = UserNotification(
-                user_id=user.id, category="ticket", title="1", body="B"
-            )
-            notif2 = UserNotification(
-                user_id=user.id, category="reminder", title="2", body="B"
-            )
-            _db.session.add_all([notif1, notif2])
-            _db.session.commit()
-            
-            published_events = []
-            def mock_publish(*args, **kwargs):
-                published_events.append(True)
-            
-            from backend.app import event_stream
-            monkeypatch.setattr(event_stream.events, "publish", mock_publish)
-            
-            from backend.app.notifications import mark_all_read
-            
-            updated = mark_all_read(user.id, session=_db.session)
-            
-            assert updated == 2
-            assert len(published_events) == 1
-    
-    def test_mark_all_read_by_category(self, app, user_factory, _db, monkeypatch):
+        db_session.execute(insert(UserNotification), [
+            {"user_id": shared_user.id, "category": "ticket", "title": "1", "body": "B"},
+            {"user_id": shared_user.id, "category": "reminder", "title": "2", "body": "B"},
+        ])
+        db_session.commit()
+        
+        updated = mark_all_read(shared_user.id, session=db_session)
+        
+        assert updated == 2
+        assert len(captured_events) == 1
+    
+    def test_mark_all_read_by_category(self, shared_user, db_session, captured_events):
         """Debe marcar solo las de una categoría."""
-        with app.app_context():
-            user = user_factory()
-            
-            ticket = UserNotification(
-                user_id=user.id, category="ticket", title="T", body="B"
-            )
-            reminder = UserNotification(
-                user_id=user.id, category="reminder", title="R", body="B"
-            )
-            _db.session.add_all([ticket, reminder])
-            _db.session.commit()
-            
-            published_events = []
-            def mock_publish(*args, **kwargs):
-                published_events.append(True)
-            
-            from backend.app import event_stream
-            monkeypatch.setattr(event_stream.events, "publish", mock_publish)
-            
-            from backend.app.notifications import mark_all_read
-            
-            updated = mark_all_read(
-                user.id,
-                category="ticket",
-                session=_db.session
-            )
-            
-            assert updated == 1
-    
-    def test_mark_all_read_no_unread(self, app, user_factory, _db, monkeypatch):
+        db_session.execute(insert(UserNotification), [
+            {"user_id": shared_user.id, "category": "ticket", "title": "T", "body": "B"},
+            {"user_id": shared_user.id, "category": "reminder", "title": "R", "body": "B"},
+        ])
+        db_session.commit()
+        
+        updated = mark_all_read(
+            shared_user.id,
+            category="ticket",
+            session=db_session
+        )
+        
+        assert updated == 1
+    
+    def test_mark_all_read_no_unread(self, shared_user, db_session, captured_events):
         """No debe publicar evento si no hay actualizaciones."""
-        with app.app_context():
-            user = user_factory()
-            
-            published_events = []
-            def mock_publish(*args, **kwargs):
-                published_events.append(True)
-            
-            from backend.app import event_stream
-            monkeypatch.setattr(event_stream.events, "publish", mock_publish)
-            
-            from backend.app.notifications import mark_all_read
-            
-            updated = mark_all_read(user.id, session=_db.session)
-            
-            assert updated == 0
-            assert len(published_events) == 0
+        updated = mark_all_read(shared_user.id, session=db_session)
+        
+        assert updated == 0
+        assert len(captured_events) == 0
 
 
 class TestUpdatePreferences:
     """Tests para update_preferences."""
     
-    def test_update_preferences_new(self, app, user_factory, _db):
+    def test_update_preferences_new(self, shared_user, db_session):
         """Debe crear nuevas preferencias."""
-        with app.app_context():
-            user = user_factory()
-            
-            from backend.app.notifications import update_preferences
-            
-            result = update_preferences(
-                user.id,
-                {"ticket": False, "reminder": True},
-                session=_db.session
-            )
-            
-            assert result["ticket"] is False
-            assert result["reminder"] is True
-            assert result["security"] is True  # default
-            assert result["role_request"] is True  # default
-    
-    def test_update_existing_preferences(self, app, user_factory, _db):
+        result = update_preferences(
+            shared_user.id,
+            {"ticket": False, "reminder": True},
+            session=db_session
+        )
+        
+        assert result["ticket"] is False
+        assert result["reminder"] is True
+        assert result["security"] is True  # default
+        assert result["role_request"] is True  # default
+    
+    def test_update_existing_preferences(self, shared_user, db_session):
         """Debe actualizar preferencias existentes."""
-        with app.app_context():
-            user = user_factory()
-            
-            pref = NotificationPreference(
-                user_id=user.id,
-                category="ticket",
-                enabled=True
-            )
-            _db.session.add(pref)
-            _db.session.commit()
-            
-            from backend.app.notifications import update_preferences
-            
-            result = update_preferences(
-                user.id,
-                {"ticket": False},
-                session=_db.session
-            )
-            
-            assert result["ticket"] is False
-            _db.session.expire_all()
-            assert pref.enabled is False
-    
-    def test_update_preferences_ignore_invalid_categories(self, app, user_factory, _db):
+        pref = NotificationPreference(
+            user_id=shared_user.id,
+            category="ticket",
+            enabled=True
+        )
+        db_session.add(pref)
+        db_session.commit()
+        
+        result = update_preferences(
+            shared_user.id,
+            {"ticket": False},
+            session=db_session
+        )
+        
+        assert result["ticket"] is False
+        db_session.refresh(pref, attribute_names=["enabled"])
+        assert pref.enabled is False
+    
+    def test_update_preferences_ignore_invalid_categories(self, shared_user, db_session):
         """Debe ignorar categorías inválidas."""
-        with app.app_context():
-            user = user_factory()
-            
-            from backend.app.notifications import update_preferences
-            
-            result = update_preferences(
-                user.id,
-                {"invalid_category": False, "ticket": False},
-                session=_db.session
-            )
-            
-            assert "invalid_category" not in result
-            assert result["ticket"] is False
-    
-    def test_update_preferences_empty_dict(self, app, user_factory, _db):
+        result = update_preferences(
+            shared_user.id,
+            {"invalid_category": False, "ticket": False},
+            session=db_session
+        )
+        
+        assert "invalid_category" not in result
+        assert result["ticket"] is False
+    
+    def test_update_preferences_empty_dict(self, shared_user, db_session):
         """Debe retornar preferencias actuales con dict vacío."""
-        with app.app_context():
-            user = user_factory()
-            
-            from backend.app.notifications import update_preferences
-            
-            result = update_preferences(
-                user.id,
-                {},
-                session=_db.session
-            )
-            
-            assert result["ticket"] is True
-            assert result["reminder"] is True
+        result = update_preferences(
+            shared_user.id,
+            {},
+            session=db_session
+        )
+        
+        assert result["ticket"] is True
+        assert result["reminder"] is True
 
 
 class TestGetPreferences:
     """Tests para get_preferences."""
     
-    def test_get_preferences_defaults(self, app, user_factory, _db):
+    def test_get_preferences_defaults(self, shared_user, db_session):
         """Debe retornar preferencias por defecto."""
-        with app.app_context():
-            user = user_factory()
-            
-            from backend.app.notifications import get_preferences
-            
-            result = get_preferences(user.id, session=_db.session)
-            
-            assert result["ticket"] is True
-            assert result["reminder"] is True
-            assert result["security"] is True
-            assert result["role_request"] is True
-    
-    def test_get_preferences_custom(self, app, user_factory, _db):
+        result = get_preferences(shared_user.id, session=db_session)
+        
+        assert result["ticket"] is True
+        assert result["reminder"] is True
+        assert result["security"] is True
+        assert result["role_request"] is True
+    
+    def test_get_preferences_custom(self, shared_user, db_session):
         """Debe retornar preferencias personalizadas."""
-        with app.app_context():
-            user = user_factory()
-            
-            pref = NotificationPreference(
-                user_id=user.id,
-                category="ticket",
-                enabled=False
-            )
-            _db.session.add(pref)
-            _db.session.commit()
-            
-            from backend.app.notifications import get_preferences
-            
-            result = get_preferences(user.id, session=_db.session)
-            
-            assert result["ticket"] is False
-            assert result["reminder"] is True
+        pref = NotificationPreference(
+            user_id=shared_user.id,
+            category="ticket",
+            enabled=False
+        )
+        db_session.add(pref)
+        db_session.commit()
+        
+        result = get_preferences(shared_user.id, session=db_session)
+        
+        assert result["ticket"] is False
+        assert result["reminder"] is True
@@ -2,138 +2,193 @@
 Tests para backend/app/services/passwords.py
 Validación de contraseñas y verificación contra HIBP.
 """
+import re
+import threading
 import pytest
-from unittest.mock import Mock
+import requests
+from dataclasses import dataclass, field
 from backend.app.services.passwords import (
     password_strength_error,
     password_is_compromised,
+    password_is_compromised_many,
     hibp_fetch_range,
+    _char_class,
+    _clear_range_cache,
+    _HIBP_SESSION,
+    _hibp_fetch_range_unchecked,
+    _parse_hibp_payload,
+    HIBP_API_RANGE_URL,
     PASSWORD_POLICY_MESSAGE
 )
 
+# App context por test (``current_app``); ningún test toca la base de datos.
+pytestmark = [pytest.mark.usefixtures("app_ctx"), pytest.mark.nodb]
+
+HIBP_GET = "backend.app.services.passwords._HIBP_SESSION.get"
+SAMPLE_LINE = "00D4F6E8FA6EECAD2A3AA415EEC418D38EC:1\n"
+
+
+@dataclass
+class FakeResponse:
+    """Respuesta mínima de requests: sólo ``text`` y ``raise_for_status``."""
+    text: str = ""
+    error: Exception | None = None
+
+    def raise_for_status(self):
+        if self.error is not None:
+            raise self.error
+
+
+@dataclass
+class FakeGet:
+    """Sustituto de ``_HIBP_SESSION.get`` que registra las URLs consultadas."""
+    response: FakeResponse = field(default_factory=lambda: FakeResponse(SAMPLE_LINE))
+    urls: list = field(default_factory=list)
+
+    def __call__(self, url, **kwargs):
+        self.urls.append(url)
+        return self.response
+
+
+@dataclass
+class FakeRedis:
+    """Cliente Redis en memoria con ``get``/``setex``; ``error`` simula una caída."""
+    store: dict = field(default_factory=dict)
+    error: Exception | None = None
+    writes: list = field(default_factory=list)
+
+    def get(self, key):
+        if self.error is not None:
+            raise self.error
+        return self.store.get(key)
+
+    def setex(self, key, ttl, value):
+        self.writes.append((key, ttl, value))
+        self.store[key] = value
+
 
 class TestPasswordStrengthError:
     """Tests para password_strength_error - validación de política de contraseñas."""
     
-    def test_none_password_returns_error(self, app):
+    def test_none_password_returns_error(self):
         """None debe retornar error de política."""
-        with app.app_context():
-            error = password_strength_error(None)
-            assert error == PASSWORD_POLICY_MESSAGE
+        error = password_strength_error(None)
+        assert error == PASSWORD_POLICY_MESSAGE
     
-    def test_empty_password_returns_error(self, app):
+    def test_empty_password_returns_error(self):
         """String vacío debe retornar error de política."""
-        with app.app_context():
-            error = password_strength_error("")
-            assert error == PASSWORD_POLICY_MESSAGE
+        error = password_strength_error("")
+        assert error == PASSWORD_POLICY_MESSAGE
     
-    def test_too_short_password_returns_error(self, app):
+    def test_too_short_password_returns_error(self):
         """Contraseña < 8 caracteres debe retornar error."""
-        with app.app_context():
-            error = password_strength_error("Aa1!")
-            assert error == PASSWORD_POLICY_MESSAGE
+        error = password_strength_error("Aa1!")
+        assert error == PASSWORD_POLICY_MESSAGE
     
-    def test_missing_uppercase_returns_error(self, app):
+    def test_missing_uppercase_returns_error(self):
         """Contraseña sin mayúscula debe retornar error."""
-        with app.app_context():
-            error = password_strength_error("password123!")
-            assert error == PASSWORD_POLICY_MESSAGE
+        error = password_strength_error("password123!")
+        assert error == PASSWORD_POLICY_MESSAGE
     
-    def test_missing_lowercase_returns_error(self, app):
+    def test_missing_lowercase_returns_error(self):
         """Contraseña sin minúscula debe retornar error."""
-        with app.app_context():
-            error = password_strength_error("PASSWORD123!")
-            assert error == PASSWORD_POLICY_MESSAGE
+        error = password_strength_error("PASSWORD123!")
+        assert error == PASSWORD_POLICY_MESSAGE
     
-    def test_missing_digit_returns_error(self, app):
+    def test_missing_digit_returns_error(self):
         """Contraseña sin dígito debe retornar error."""
-        with app.app_context():
-            error = password_strength_error("Password!")
-            assert error == PASSWORD_POLICY_MESSAGE
+        error = password_strength_error("Password!")
+        assert error == PASSWORD_POLICY_MESSAGE
     
-    def test_missing_special_char_returns_error(self, app):
+    def test_missing_special_char_returns_error(self):
         """Contraseña sin carácter especial debe retornar error."""
-        with app.app_context():
-            error = password_strength_error("Password123")
-            assert error == PASSWORD_POLICY_MESSAGE
+        error = password_strength_error("Password123")
+        assert error == PASSWORD_POLICY_MESSAGE
     
-    def test_valid_strong_password_returns_none(self, app):
+    def test_valid_strong_password_returns_none(self, app, monkeypatch):
         """Contraseña fuerte válida debe retornar None."""
-        with app.app_context():
-            app.config["HIBP_PASSWORD_CHECK_ENABLED"] = False
-            error = password_strength_error("ValidPass123!")
-            assert error is None
+        monkeypatch.setitem(app.config, "HIBP_PASSWORD_CHECK_ENABLED", False)
+        error = password_strength_error("ValidPass123!")
+        assert error is None
     
-    def test_valid_strong_password_with_symbols(self, app):
+    def test_valid_strong_password_with_symbols(self, app, monkeypatch):
         """Contraseña válida con varios símbolos especiales."""
-        with app.app_context():
-            app.config["HIBP_PASSWORD_CHECK_ENABLED"] = False
-            error = password_strength_error("MyP@ssw0rd#2025")
-            assert error is None
+        monkeypatch.setitem(app.config, "HIBP_PASSWORD_CHECK_ENABLED", False)
+        error = password_strength_error("MyP@ssw0rd#2025")
+        assert error is None
     
     def test_hibp_check_disabled_allows_compromised(self, app, monkeypatch):
         """Con HIBP deshabilitado, contraseña comprometida debe pasar."""
-        with app.app_context():
-            app.config["HIBP_PASSWORD_CHECK_ENABLED"] = False
-            
-            # Simular que "Password123!" está comprometida
-            monkeypatch.setattr(
-                "backend.app.services.passwords.password_is_compromised",
-                lambda pwd, threshold: True
-            )
-            
-            error = password_strength_error("Password123!")
-            assert error is None
+        monkeypatch.setitem(app.config, "HIBP_PASSWORD_CHECK_ENABLED", False)
+        
+        # Simular que "Password123!" está comprometida
+        monkeypatch.setattr(
+            "backend.app.services.passwords.password_is_compromised",
+            lambda pwd, threshold: True
+        )
+        
+        error = password_strength_error("Password123!")
+        assert error is None
     
     def test_hibp_check_enabled_rejects_compromised(self, app, monkeypatch):
         """Con HIBP habilitado, contraseña comprometida debe fallar."""
-        with app.app_context():
-            app.config["HIBP_PASSWORD_CHECK_ENABLED"] = True
-            app.config["HIBP_PASSWORD_MIN_COUNT"] = 1
-            
-            # Simular que la contraseña está comprometida
-            monkeypatch.setattr(
-                "backend.app.services.passwords.password_is_compromised",
-                lambda pwd, threshold: True
-            )
-            
-            error = password_strength_error("ValidPass123!")
-            assert error is not None
-            assert "bases de datos filtradas" in error.lower()
+        monkeypatch.setitem(app.config, "HIBP_PASSWORD_CHECK_ENABLED", True)
+        monkeypatch.setitem(app.config, "HIBP_PASSWORD_MIN_COUNT", 1)
+        
+        # Simular que la contraseña está comprometida
+        monkeypatch.setattr(
+            "backend.app.services.passwords.password_is_compromised",
+            lambda pwd, threshold: True
+        )
+        
+        error = password_strength_error("ValidPass123!")
+        assert error is not None
+        assert "bases de datos filtradas" in error.lower()
     
     def test_hibp_check_enabled_allows_clean(self, app, monkeypatch):
         """Con HIBP habilitado, contraseña limpia debe pasar."""
-        with app.app_context():
-            app.config["HIBP_PASSWORD_CHECK_ENABLED"] = True
-            app.config["HIBP_PASSWORD_MIN_COUNT"] = 1
-            
-            # Simular que la contraseña NO está comprometida
-            monkeypatch.setattr(
-                "backend.app.services.passwords.password_is_compromised",
-                lambda pwd, threshold: False
-            )
-            
-            error = password_strength_error("UniqueP@ss2025!")
-            assert error is None
+        monkeypatch.setitem(app.config, "HIBP_PASSWORD_CHECK_ENABLED", True)
+        monkeypatch.setitem(app.config, "HIBP_PASSWORD_MIN_COUNT", 1)
+        
+        # Simular que la contraseña NO está comprometida
+        monkeypatch.setattr(
+            "backend.app.services.passwords.password_is_compromised",
+            lambda pwd, threshold: False
+        )
+        
+        error = password_strength_error("UniqueP@ss2025!")
+        assert error is None
     
     def test_hibp_threshold_invalid_defaults_to_1(self, app, monkeypatch):
         """Threshold inválido debe usar default de 1."""
-        with app.app_context():
-            app.config["HIBP_PASSWORD_CHECK_ENABLED"] = True
-            app.config["HIBP_PASSWORD_MIN_COUNT"] = "invalid"
-            
-            calls = []
-            def mock_compromised(pwd, threshold):
-                calls.append(threshold)
-                return False
-            
-            monkeypatch.setattr(
-                "backend.app.services.passwords.password_is_compromised",
-                mock_compromised
-            )
-            
-            password_strength_error("ValidPass123!")
-            assert calls == [1]  # Debe usar default 1
+        monkeypatch.setitem(app.config, "HIBP_PASSWORD_CHECK_ENABLED", True)
+        monkeypatch.setitem(app.config, "HIBP_PASSWORD_MIN_COUNT", "invalid")
+        
+        calls = []
+        def mock_compromised(pwd, threshold):
+            calls.append(threshold)
+            return False
+        
+        monkeypatch.setattr(
+            "backend.app.services.passwords.password_is_compromised",
+            mock_compromised
+        )
+        
+        password_strength_error("ValidPass123!")
+        assert calls == [1]  # Debe usar default 1
+    
+    def test_char_classes_match_policy_regexes(self):
+        """El escaneo de una pasada debe clasificar igual que las regex originales."""
+        patterns = [(1, r"[A-Z]"), (2, r"[a-z]"), (4, r"\d"), (8, r"[^\w\s]")]
+        for code in range(0x10000):
+            char = chr(code)
+            expected = next((bit for bit, pattern in patterns if re.search(pattern, char)), 0)
+            assert _char_class(char) == expected, repr(char)
+    
+    @pytest.mark.parametrize("password", ["Ünïcødé 2025!", "Pass_word12", "Pass word12"])
+    def test_unicode_and_word_chars_keep_regex_semantics(self, password):
+        """Letras no ASCII no cuentan como mayúscula; espacios y '_' no son especiales."""
+        assert password_strength_error(password) == PASSWORD_POLICY_MESSAGE
 
 
 class TestPasswordIsCompromised:
@@ -157,7 +212,7 @@ class TestPasswordIsCompromised:
             return {}
         
         monkeypatch.setattr(
-            "backend.app.services.passwords.hibp_fetch_range",
+            "backend.app.services.passwords._hibp_fetch_range_unchecked",
             mock_fetch
         )
         
@@ -172,7 +227,7 @@ class TestPasswordIsCompromised:
             return {}
         
         monkeypatch.setattr(
-            "backend.app.services.passwords.hibp_fetch_range",
+            "backend.app.services.passwords._hibp_fetch_range_unchecked",
             mock_fetch
         )
         
@@ -187,7 +242,7 @@ class TestPasswordIsCompromised:
             return {}
         
         monkeypatch.setattr(
-            "backend.app.services.passwords.hibp_fetch_range",
+            "backend.app.services.passwords._hibp_fetch_range_unchecked",
             mock_fetch
         )
         
@@ -203,7 +258,7 @@ class TestPasswordIsCompromised:
             return {}
         
         monkeypatch.setattr(
-            "backend.app.services.passwords.hibp_fetch_range",
+            "backend.app.services.passwords._hibp_fetch_range_unchecked",
             mock_fetch
         )
         
@@ -218,7 +273,7 @@ class TestPasswordIsCompromised:
             return {}
         
         monkeypatch.setattr(
-            "backend.app.services.passwords.hibp_fetch_range",
+            "backend.app.services.passwords._hibp_fetch_range_unchecked",
             mock_fetch
         )
         
@@ -227,15 +282,75 @@ class TestPasswordIsCompromised:
         assert result is True
 
 
+class TestPasswordIsCompromisedMany:
+    """Tests para password_is_compromised_many - verificación por lotes."""
+    
+    def test_results_keep_input_order(self, monkeypatch):
+        """Cada resultado corresponde a la contraseña en la misma posición."""
+        def mock_fetch(prefix):
+            if prefix == "5BAA6":
+                return {"1E4C9B93F3F0682250B6CF8331B7EE68FD8": 100}
+            return {}
+        
+        monkeypatch.setattr(
+            "backend.app.services.passwords._hibp_fetch_range_unchecked",
+            mock_fetch
+        )
+        
+        result = password_is_compromised_many(
+            ["SuperUniqueP@ss2025!", "password", "", None],
+            minimum_count=1
+        )
+        assert result == [False, True, False, False]
+    
+    def test_one_fetch_per_unique_prefix(self, monkeypatch):
+        """Contraseñas con el mismo prefijo SHA1 deben consultar HIBP una sola vez."""
+        fetched = []
+        
+        def mock_fetch(prefix):
+            fetched.append(prefix)
+            return {"1E4C9B93F3F0682250B6CF8331B7EE68FD8": 5}
+        
+        monkeypatch.setattr(
+            "backend.app.services.passwords._hibp_fetch_range_unchecked",
+            mock_fetch
+        )
+        
+        result = password_is_compromised_many(
+            ["password", "password", "OtraClave#2025"],
+            minimum_count=10
+        )
+        assert result == [False, False, False]
+        assert sorted(fetched) == sorted(set(fetched))
+        assert len(fetched) == 2
+
+    
+    def test_distinct_prefixes_fetched_concurrently(self, monkeypatch):
+        """Prefijos distintos deben consultarse en paralelo, no uno tras otro."""
+        barrier = threading.Barrier(2, timeout=2)
+        
+        def mock_fetch(prefix):
+            barrier.wait()  # Sólo se libera si ambas consultas están en curso
+            return {}
+        
+        monkeypatch.setattr(
+            "backend.app.services.passwords._hibp_fetch_range_unchecked",
+            mock_fetch
+        )
+        
+        result = password_is_compromised_many(["password", "OtraClave#2025"], minimum_count=1)
+        assert result == [False, False]
+
+
 class TestHibpFetchRange:
     """Tests para hibp_fetch_range - llamada a API de HIBP."""
     
     @pytest.fixture(autouse=True)
     def clear_cache(self):
         """Limpiar cache antes de cada test."""
-        hibp_fetch_range.cache_clear()
+        _clear_range_cache()
         yield
-        hibp_fetch_range.cache_clear()
+        _clear_range_cache()
     
     def test_empty_prefix_returns_empty_dict(self):
         """Prefix vacío debe retornar dict vacío."""
@@ -254,16 +369,12 @@ class TestHibpFetchRange:
     
     def test_successful_api_call_parses_response(self, monkeypatch):
         """Respuesta exitosa de HIBP debe parsear correctamente."""
-        mock_response = Mock()
-        mock_response.text = (
+        fake_get = FakeGet(FakeResponse(
             "00D4F6E8FA6EECAD2A3AA415EEC418D38EC:3\n"
             "011053FD0102E94D6AE2F8B83D76FAF94F6:1\n"
             "012A7CA357541F0AC487871FEEC1891C49C:2\n"
-        )
-        mock_response.raise_for_status = Mock()
-        
-        mock_get = Mock(return_value=mock_response)
-        monkeypatch.setattr("backend.app.services.passwords.requests.get", mock_get)
+        ))
+        monkeypatch.setattr(HIBP_GET, fake_get)
         
         result = hibp_fetch_range("5BAA6")
         
@@ -272,50 +383,44 @@ class TestHibpFetchRange:
         assert result["011053FD0102E94D6AE2F8B83D76FAF94F6"] == 1
         assert result["012A7CA357541F0AC487871FEEC1891C49C"] == 2
         
-        # Verificar que se llamó con URL correcta
-        mock_get.assert_called_once()
-        call_args = mock_get.call_args
-        assert "5BAA6" in call_args[0][0]
+        # Verificar que se llamó una vez con URL correcta
+        assert len(fake_get.urls) == 1
+        assert "5BAA6" in fake_get.urls[0]
     
     def test_api_timeout_returns_empty(self, monkeypatch):
         """Timeout de API debe retornar dict vacío."""
         def mock_get(*args, **kwargs):
-            import requests
             raise requests.exceptions.Timeout("Connection timeout")
         
-        monkeypatch.setattr("backend.app.services.passwords.requests.get", mock_get)
+        monkeypatch.setattr(HIBP_GET, mock_get)
         
         result = hibp_fetch_range("5BAA6")
         assert result == {}
     
+    def test_connect_and_read_failures_not_retried(self):
+        """Sólo los 502/503/504 se reintentan: un HIBP caído no multiplica la latencia."""
+        retry = _HIBP_SESSION.get_adapter(HIBP_API_RANGE_URL).max_retries
+        assert (retry.connect, retry.read) == (0, 0)
+        assert set(retry.status_forcelist) == {502, 503, 504}
+    
     def test_api_http_error_returns_empty(self, monkeypatch):
         """Error HTTP (4xx/5xx) debe retornar dict vacío."""
-        mock_response = Mock()
-        mock_response.raise_for_status = Mock(
-            side_effect=Exception("HTTP 503 Service Unavailable")
-        )
-        
-        mock_get = Mock(return_value=mock_response)
-        monkeypatch.setattr("backend.app.services.passwords.requests.get", mock_get)
+        error = Exception("HTTP 503 Service Unavailable")
+        monkeypatch.setattr(HIBP_GET, FakeGet(FakeResponse(error=error)))
         
         result = hibp_fetch_range("5BAA6")
         assert result == {}
     
     def test_malformed_response_lines_skipped(self, monkeypatch):
         """Líneas malformadas en respuesta deben ser ignoradas."""
-        mock_response = Mock()
-        mock_response.text = (
+        monkeypatch.setattr(HIBP_GET, FakeGet(FakeResponse(
             "00D4F6E8FA6EECAD2A3AA415EEC418D38EC:3\n"
             "INVALID_LINE_NO_COLON\n"
             "SHORT:10\n"  # Sufijo muy corto (< 35 chars)
             "012A7CA357541F0AC487871FEEC1891C49C:notanumber\n"  # Count no numérico
             "\n"  # Línea vacía
             "011053FD0102E94D6AE2F8B83D76FAF94F6:5\n"  # Válido (35 caracteres)
-        )
-        mock_response.raise_for_status = Mock()
-        
-        mock_get = Mock(return_value=mock_response)
-        monkeypatch.setattr("backend.app.services.passwords.requests.get", mock_get)
+        )))
         
         result = hibp_fetch_range("5BAA6")
         
@@ -324,55 +429,126 @@ class TestHibpFetchRange:
         assert result["00D4F6E8FA6EECAD2A3AA415EEC418D38EC"] == 3
         assert result["011053FD0102E94D6AE2F8B83D76FAF94F6"] == 5
     
+    @pytest.mark.parametrize(
+        "payload",
+        [
+            "00D4F6E8FA6EECAD2A3AA415EEC418D38EC:3\r\n011053FD0102E94D6AE2F8B83D76FAF94F6:0\r\n",
+            "00d4f6e8fa6eecad2a3aa415eec418d38ec: 3\n\n011053FD0102E94D6AE2F8B83D76FAF94F6:0",
+        ],
+        ids=["canonical-crlf", "tolerant"],
+    )
+    def test_parse_payload_canonical_and_tolerant_agree(self, payload):
+        """El parseo en bloque y el tolerante deben producir el mismo resultado."""
+        assert _parse_hibp_payload(payload) == {
+            "00D4F6E8FA6EECAD2A3AA415EEC418D38EC": 3,
+            "011053FD0102E94D6AE2F8B83D76FAF94F6": 0,
+        }
+    
+    def test_negative_counts_skipped(self, monkeypatch):
+        """Un conteo negativo (HIBP o Redis corruptos) se omite en vez de romper el empaquetado."""
+        monkeypatch.setattr(HIBP_GET, FakeGet(FakeResponse(
+            "1E4C9B93F3F0682250B6CF8331B7EE68FD8:-1\n"
+            "011053FD0102E94D6AE2F8B83D76FAF94F6:5\n"
+        )))
+        
+        assert dict(hibp_fetch_range("5BAA6")) == {"011053FD0102E94D6AE2F8B83D76FAF94F6": 5}
+        assert password_is_compromised("password", minimum_count=1) is False
+    
     def test_prefix_normalized_to_uppercase(self, monkeypatch):
         """Prefix debe normalizarse a uppercase antes de llamar API."""
-        mock_response = Mock()
-        mock_response.text = "00D4F6E8FA6EECAD2A3AA415EEC418D38EC:1\n"
-        mock_response.raise_for_status = Mock()
-        
-        mock_get = Mock(return_value=mock_response)
-        monkeypatch.setattr("backend.app.services.passwords.requests.get", mock_get)
+        fake_get = FakeGet()
+        monkeypatch.setattr(HIBP_GET, fake_get)
         
         result = hibp_fetch_range("5baa6")  # lowercase
         
         # Debe llamar con uppercase
-        call_args = mock_get.call_args
-        assert "5BAA6" in call_args[0][0]
+        assert "5BAA6" in fake_get.urls[0]
         assert len(result) == 1
     
     def test_caching_works_for_same_prefix(self, monkeypatch):
         """Cache LRU debe evitar llamadas repetidas a API."""
-        call_count = []
-        
-        def mock_get(*args, **kwargs):
-            call_count.append(1)
-            mock_response = Mock()
-            mock_response.text = "00D4F6E8FA6EECAD2A3AA415EEC418D38EC:1\n"
-            mock_response.raise_for_status = Mock()
-            return mock_response
-        
-        monkeypatch.setattr("backend.app.services.passwords.requests.get", mock_get)
-        
-        # Limpiar cache antes de test
-        hibp_fetch_range.cache_clear()
+        fake_get = FakeGet()
+        monkeypatch.setattr(HIBP_GET, fake_get)
         
         # Primera llamada - debe hacer request
         result1 = hibp_fetch_range("AAAAA")
-        assert len(call_count) == 1
+        assert len(fake_get.urls) == 1
         
         # Segunda llamada con mismo prefix - debe usar cache
         result2 = hibp_fetch_range("AAAAA")
-        assert len(call_count) == 1  # No aumentó
+        assert len(fake_get.urls) == 1  # No aumentó
         
         assert result1 == result2
     
+    def test_expired_entries_are_refetched(self, monkeypatch):
+        """Entradas vencidas (TTL) deben volver a consultarse."""
+        fake_get = FakeGet()
+        monkeypatch.setattr(HIBP_GET, fake_get)
+        monkeypatch.setattr("backend.app.services.passwords.HIBP_RANGE_CACHE_TTL", 0)
+        
+        hibp_fetch_range("AAAAA")
+        hibp_fetch_range("AAAAA")
+        assert len(fake_get.urls) == 2
+    
+    def test_cache_evicts_least_recently_used(self, monkeypatch):
+        """Al superar el tamaño máximo se descarta el prefijo menos usado."""
+        fake_get = FakeGet()
+        monkeypatch.setattr(HIBP_GET, fake_get)
+        monkeypatch.setattr("backend.app.services.passwords.HIBP_RANGE_CACHE_SIZE", 1)
+        
+        hibp_fetch_range("AAAAA")
+        hibp_fetch_range("BBBBB")  # Desplaza a AAAAA
+        hibp_fetch_range("AAAAA")
+        assert len(fake_get.urls) == 3
+    
     def test_network_error_returns_empty(self, monkeypatch):
         """Error de red (ConnectionError, etc) debe retornar dict vacío."""
         def mock_get(*args, **kwargs):
-            import requests
             raise requests.exceptions.ConnectionError("Network unreachable")
         
-        monkeypatch.setattr("backend.app.services.passwords.requests.get", mock_get)
+        monkeypatch.setattr(HIBP_GET, mock_get)
         
         result = hibp_fetch_range("5BAA6")
         assert result == {}
+    
+    def test_unchecked_fetch_shares_cache_with_public(self, monkeypatch):
+        """La variante interna sin validación debe reutilizar la misma caché."""
+        fake_get = FakeGet()
+        monkeypatch.setattr(HIBP_GET, fake_get)
+        
+        first = hibp_fetch_range("5baa6")
+        assert _hibp_fetch_range_unchecked("5BAA6") is first
+        assert len(fake_get.urls) == 1
+    
+    def test_shared_cache_hit_skips_api(self, monkeypatch):
+        """Un rango presente en la caché compartida no debe consultar HIBP."""
+        redis_client = FakeRedis({"hibp:range:5BAA6": b"00D4F6E8FA6EECAD2A3AA415EEC418D38EC:7\n"})
+        fake_get = FakeGet()
+        monkeypatch.setattr(HIBP_GET, fake_get)
+        monkeypatch.setattr("backend.app.services.passwords._shared_range_cache", lambda: redis_client)
+        
+        result = hibp_fetch_range("5BAA6")
+        
+        assert result["00D4F6E8FA6EECAD2A3AA415EEC418D38EC"] == 7
+        assert fake_get.urls == []
+        assert redis_client.writes == []
+    
+    def test_shared_cache_miss_stores_raw_payload(self, monkeypatch):
+        """Un miss en la caché compartida debe guardar el texto crudo con TTL."""
+        redis_client = FakeRedis()
+        monkeypatch.setattr(HIBP_GET, FakeGet())
+        monkeypatch.setattr("backend.app.services.passwords._shared_range_cache", lambda: redis_client)
+        
+        hibp_fetch_range("5BAA6")
+        
+        assert redis_client.writes == [("hibp:range:5BAA6", 24 * 60 * 60, SAMPLE_LINE)]
+    
+    def test_shared_cache_errors_fall_back_to_api(self, monkeypatch):
+        """Si Redis falla, la consulta debe seguir contra HIBP."""
+        redis_client = FakeRedis(error=ConnectionError("redis caído"))
+        monkeypatch.setattr(HIBP_GET, FakeGet())
+        monkeypatch.setattr("backend.app.services.passwords._shared_range_cache", lambda: redis_client)
+        
+        result = hibp_fetch_range("5BAA6")
+        
+        assert len(result) == 1
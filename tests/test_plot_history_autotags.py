@@ -1,6 +1,6 @@
 import pytest
 
-from backend.app.plot_tags import classify_expression
+from backend.app.plot_tags import _classify_lowered, classify_expression
 
 
 @pytest.mark.parametrize(
@@ -38,4 +38,25 @@ def test_classify_expression_returns_other_when_unknown():
 def test_classify_expression_rational_does_not_flag_trig():
     categories = classify_expression("sin(x)/x")
     assert "trigonometric" in categories
-    assert "rational" not in categories
\ No newline at end of file
+    assert "rational" not in categories
+
+@pytest.mark.parametrize(
+    ("expression", "expected"),
+    [
+        ("y=asinh(x)", {"hyperbolic"}),
+        ("y=LOG(x)", {"logarithmic"}),
+        ("y=sin2(x) + login", {"other"}),
+        # Fuera de ASCII se conserva IGNORECASE: "ı" sin punto y "ſ" larga equivalen a "i"/"s"
+        ("y = sın(x)", {"trigonometric"}),
+        ("y = ſinh(x)", {"hyperbolic"}),
+    ],
+)
+def test_classify_expression_matches_whole_function_names(expression, expected):
+    assert classify_expression(expression) == expected
+
+
+def test_classify_expression_is_cached_per_normalized_text():
+    _classify_lowered.cache_clear()
+    first = classify_expression("y = SIN(x)")
+    assert classify_expression("  y = sin(x) ") is first
+    assert isinstance(first, frozenset)
@@ -1,6 +1,7 @@
 """Tests de cobertura para plot_tags.py."""
 
 import pytest
+from sqlalchemy import event
 
 from backend.app.plot_tags import (
     _normalize_tag_name,
@@ -26,6 +27,12 @@ class TestTagUtilities:
         assert _normalize_tag_name("") is None
         assert _normalize_tag_name("   ") is None
 
+    def test_normalize_tag_name_keeps_characters(self):
+        """Sólo recorta y pasa a minúsculas; no elimina signos ni aplica casefold."""
+        assert _normalize_tag_name("  C++ (Beta) ") == "c++ (beta)"
+        assert _normalize_tag_name("Straße") == "straße"
+        assert _normalize_tag_name(42) == "42"
+
     def test_extract_rhs_no_equals(self):
         """Debe retornar expresión completa sin '='."""
         assert _extract_rhs("x^2 + 1") == "x^2 + 1"
@@ -109,6 +116,30 @@ class TestTagsWithDatabase:
             assert len(result) == 1
             assert result[0].id == existing.id
 
+    def test_ensure_tag_objects_mixed_existing_and_new(self, app, user_factory, _db):
+        """Debe reutilizar los existentes y crear el resto en un solo INSERT."""
+        with app.app_context():
+            user = user_factory()
+            existing = Tags(user_id=user.id, name="beta")
+            _db.session.add(existing)
+            _db.session.commit()
+            
+            inserts = []
+            
+            def count_tag_inserts(conn, cursor, statement, parameters, context, executemany):
+                if statement.lstrip().upper().startswith("INSERT INTO TAGS"):
+                    inserts.append(statement)
+            
+            event.listen(_db.engine, "before_cursor_execute", count_tag_inserts)
+            try:
+                result = _ensure_tag_objects(user.id, {"Gamma", "beta", "alpha"}, session=_db.session)
+            finally:
+                event.remove(_db.engine, "before_cursor_execute", count_tag_inserts)
+            assert len(inserts) == 1
+            assert [tag.name for tag in result] == ["alpha", "beta", "gamma"]
+            assert result[1].id == existing.id
+            assert all(tag.id is not None for tag in result)
+
     def test_apply_tags_empty_names(self, app, user_factory, _db):
         """Debe aplicar tag 'other' cuando no hay nombres."""
         with app.app_context():
@@ -152,6 +183,23 @@ class TestTagsWithDatabase:
             assert len(history.tags_association) == 1
             assert history.tags_association[0].tag.name == "tag3"
 
+    def test_apply_tags_replace_keeps_overlapping(self, app, user_factory, _db):
+        """Reemplazar debe conservar las asociaciones que siguen vigentes."""
+        with app.app_context():
+            user = user_factory()
+            history = PlotHistory(user_id=user.id, expression="y=x^2", plot_parameters={})
+            _db.session.add(history)
+            _db.session.commit()
+            apply_tags_to_history(history, ["keep", "drop"], session=_db.session)
+            _db.session.commit()
+            _db.session.expire_all()
+            
+            attached = apply_tags_to_history(history, ["keep", "added"], session=_db.session, replace=True)
+            _db.session.commit()
+            
+            assert attached == {"added"}
+            assert sorted(assoc.tag.name for assoc in history.tags_association) == ["added", "keep"]
+
     def test_auto_tag_history_basic(self, app, user_factory, _db):
         """Debe auto-etiquetar historial."""
         with app.app_context():
@@ -8,13 +8,10 @@ import pytest
 class TestRoleRequestStatus:
     """Tests para obtener estado de solicitud de rol."""
     
-    def test_get_role_request_status_no_request(self, app, client, session_token_factory):
+    def test_get_role_request_status_no_request(self, app, auth_client):
         """Sin solicitud debe retornar request=None."""
         with app.app_context():
-            token, user = session_token_factory()
-            headers = {"Authorization": f"Bearer {token}"}
-            
-            response = client.get('/api/role-requests/me', headers=headers)
+            response = auth_client.get('/api/role-requests/me')
             
             assert response.status_code == 200
             data = response.json
@@ -9,13 +9,14 @@ Validates:
 - Human-readable logging works in development mode
 """
 
+import itertools
 import json
 import logging
-import uuid
+import sys
 from io import StringIO
 
 import pytest
-from flask import g
+from flask import Flask, g
 
 from backend.app.logging_config import (
     ContextualJsonFormatter,
@@ -24,6 +25,30 @@ from backend.app.logging_config import (
 )
 
 
+_LOGGER = logging.getLogger("test.logger")
+_JSON_FMT_PROD = ContextualJsonFormatter(app_env="production")
+_JSON_FMT_TEST = ContextualJsonFormatter(app_env="test")
+_DEV_FMT = DevelopmentFormatter()
+# No test checks the request_id format, only that it is present
+_REQUEST_IDS = itertools.count()
+
+
+def _rec(level=logging.INFO, msg="Test message", exc_info=None):
+    """Build a log record as emitted from test.py:42."""
+    return _LOGGER.makeRecord("test.logger", level, "test.py", 42, msg, (), exc_info)
+
+
+def _fmt(level=logging.INFO, msg="Test message", exc_info=None, fmt=_JSON_FMT_TEST):
+    """Format a record with a JSON formatter and return the parsed payload."""
+    return json.loads(fmt.format(_rec(level, msg, exc_info)))
+
+
+@pytest.fixture(scope="module")
+def bare_app():
+    """Minimal Flask app: configure_logging only reads APP_ENV, LOG_LEVEL and LOG_JSON_ENABLED."""
+    return Flask("t")
+
+
 class TestLoggingConfiguration:
     """Test logging configuration setup."""
 
@@ -93,23 +118,7 @@ class TestStructuredLogFields:
 
     def test_json_formatter_adds_standard_fields(self, app):
         """Verify JSON formatter adds standard fields."""
-        formatter = ContextualJsonFormatter(app_env="production")
-        
-        # Create a log record
-        logger = logging.getLogger("test")
-        record = logger.makeRecord(
-            name="test.logger",
-            level=logging.INFO,
-            fn="test.py",
-            lno=42,
-            msg="Test message",
-            args=(),
-            exc_info=None,
-        )
-        
-        # Format the record
-        formatted = formatter.format(record)
-        log_data = json.loads(formatted)
+        log_data = _fmt(fmt=_JSON_FMT_PROD)
         
         # Verify standard fields
         assert "timestamp" in log_data
@@ -124,25 +133,11 @@ class TestStructuredLogFields:
 
     def test_json_formatter_with_request_context(self, app, client):
         """Verify JSON formatter adds request context fields."""
-        formatter = ContextualJsonFormatter(app_env="test")
-        
         with app.test_request_context("/api/health"):
             # Set up request context
-            g.request_id = str(uuid.uuid4())
-            
-            logger = logging.getLogger("test")
-            record = logger.makeRecord(
-                name="test.logger",
-                level=logging.INFO,
-                fn="test.py",
-                lno=42,
-                msg="Test message with context",
-                args=(),
-                exc_info=None,
-            )
+            g.request_id = f"test-{next(_REQUEST_IDS)}"
             
-            formatted = formatter.format(record)
-            log_data = json.loads(formatted)
+            log_data = _fmt(msg="Test message with context")
             
             # Verify request context fields
             assert "request_id" in log_data
@@ -152,20 +147,7 @@ class TestStructuredLogFields:
 
     def test_development_formatter_readable(self, app):
         """Verify development formatter produces human-readable output."""
-        formatter = DevelopmentFormatter()
-        
-        logger = logging.getLogger("test")
-        record = logger.makeRecord(
-            name="test.logger",
-            level=logging.INFO,
-            fn="test.py",
-            lno=42,
-            msg="Test message",
-            args=(),
-            exc_info=None,
-        )
-        
-        formatted = formatter.format(record)
+        formatted = _DEV_FMT.format(_rec())
         
         # Should contain level name and message
         assert "INFO" in formatted
@@ -178,28 +160,10 @@ class TestExceptionLogging:
 
     def test_exception_includes_stack_trace(self, app):
         """Verify exceptions are logged with stack traces."""
-        formatter = ContextualJsonFormatter(app_env="production")
-        
-        logger = logging.getLogger("test")
-        
         try:
             raise ValueError("Test exception")
         except ValueError:
-            import sys
-            exc_info = sys.exc_info()
-            
-            record = logger.makeRecord(
-                name="test.logger",
-                level=logging.ERROR,
-                fn="test.py",
-                lno=42,
-                msg="Exception occurred",
-                args=(),
-                exc_info=exc_info,
-            )
-            
-            formatted = formatter.format(record)
-            log_data = json.loads(formatted)
+            log_data = _fmt(logging.ERROR, "Exception occurred", sys.exc_info(), fmt=_JSON_FMT_PROD)
             
             # Verify exception field exists and contains stack trace
             assert "exception" in log_data
@@ -235,48 +199,21 @@ class TestBackwardCompatibility:
 class TestLoggingInDifferentEnvironments:
     """Test logging behavior in different environments."""
 
-    def test_production_uses_json_logging(self):
-        """Verify production environment uses JSON logging."""
-        from flask import Flask
-        from backend.config import Config
-        
-        # Create a temporary config for production
-        class ProdConfig(Config):
-            TESTING = False
-            APP_ENV = "production"
-            LOG_JSON_ENABLED = True
-            SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
-        
-        test_app = Flask(__name__)
-        test_app.config.from_object(ProdConfig)
+    @pytest.mark.parametrize(
+        "app_env,json_enabled,formatter_cls",
+        [
+            ("production", True, ContextualJsonFormatter),
+            ("development", False, DevelopmentFormatter),
+        ],
+        ids=["production-json", "development-readable"],
+    )
+    def test_environment_selects_formatter(self, bare_app, app_env, json_enabled, formatter_cls):
+        """Verify APP_ENV/LOG_JSON_ENABLED select the JSON or readable formatter."""
+        bare_app.config.update(APP_ENV=app_env, LOG_JSON_ENABLED=json_enabled)
+        configure_logging(bare_app)
         
-        from backend.app.logging_config import configure_logging
-        configure_logging(test_app)
-        
-        # Verify JSON formatter is used
-        handler = test_app.logger.handlers[0]
-        assert isinstance(handler.formatter, ContextualJsonFormatter)
-
-    def test_development_uses_readable_logging(self):
-        """Verify development environment uses readable logging."""
-        from flask import Flask
-        from backend.config import Config
-        
-        class DevConfig(Config):
-            TESTING = False
-            APP_ENV = "development"
-            LOG_JSON_ENABLED = False
-            SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
-        
-        test_app = Flask(__name__)
-        test_app.config.from_object(DevConfig)
-        
-        from backend.app.logging_config import configure_logging
-        configure_logging(test_app)
-        
-        # Verify development formatter is used
-        handler = test_app.logger.handlers[0]
-        assert isinstance(handler.formatter, DevelopmentFormatter)
+        handler = bare_app.logger.handlers[0]
+        assert isinstance(handler.formatter, formatter_cls)
 
     def test_test_environment_minimal_logging(self, app):
         """Verify test environment has minimal logging."""
@@ -305,7 +242,7 @@ class TestUserContextInLogs:
         # in basic tests, but the infrastructure is there
         # Just verify the mechanism exists
         with app.test_request_context("/api/health"):
-            g.request_id = str(uuid.uuid4())
+            g.request_id = f"test-{next(_REQUEST_IDS)}"
             
             # Mock user
             class MockUser:
@@ -314,20 +251,7 @@ class TestUserContextInLogs:
             
             g.current_user = MockUser()
             
-            formatter = ContextualJsonFormatter(app_env="test")
-            logger = logging.getLogger("test")
-            record = logger.makeRecord(
-                name="test.logger",
-                level=logging.INFO,
-                fn="test.py",
-                lno=42,
-                msg="User action",
-                args=(),
-                exc_info=None,
-            )
-            
-            formatted = formatter.format(record)
-            log_data = json.loads(formatted)
+            log_data = _fmt(msg="User action")
             
             # Verify user context
             assert "user_id" in log_data
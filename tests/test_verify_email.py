@@ -1,28 +1,26 @@
-from urllib.parse import urlparse, parse_qs
+import pytest
 
-def test_verify_email_flow(client, make_token):
-    token_obj, user = make_token(token_type="verify_email", ttl_hours=24)
-    # GET /api/verify-email?token=...
-    res = client.get(f"/api/verify-email?token={token_obj.token}", follow_redirects=False)
-    # Debe redirigir al frontend con ?verified=true
-    assert res.status_code in (301, 302)
-    location = res.headers["Location"]
-    # index.html se sirve desde frontend blueprint; la ruta redirige al index con query
-    # Queremos ver 'verified=true' o similar
-    assert "verified=true" in location
 
-def test_verify_email_expired(client, make_token, app):
-    token_obj, user = make_token(ttl_hours=-1)
-    res = client.get(f"/api/verify-email?token={token_obj.token}", follow_redirects=False)
-    assert res.status_code in (301, 302)
-    assert "token_expired" in res.headers["Location"]
+def _url_with_token(ttl_hours):
+    """Emite un token real de verificación con la vigencia dada y arma la URL."""
+    def build(make_token):
+        token_obj, _ = make_token(token_type="verify_email", ttl_hours=ttl_hours)
+        return f"/api/verify-email?token={token_obj.token}"
+    return build
 
-def test_verify_email_invalid(client):
-    res = client.get("/api/verify-email?token=does-not-exist", follow_redirects=False)
-    assert res.status_code in (301, 302)
-    assert "invalid_token" in res.headers["Location"]
 
-def test_verify_email_missing_token(client):
-    res = client.get("/api/verify-email", follow_redirects=False)
+@pytest.mark.parametrize(
+    "build_url,expected",
+    [
+        (_url_with_token(24), "verified=true"),
+        (_url_with_token(-1), "token_expired"),
+        (lambda make_token: "/api/verify-email?token=does-not-exist", "invalid_token"),
+        (lambda make_token: "/api/verify-email", "missing_token"),
+    ],
+    ids=["valid", "expired", "invalid", "missing"],
+)
+def test_verify_email_redirect(client, make_token, build_url, expected):
+    res = client.get(build_url(make_token), follow_redirects=False)
+    # Siempre redirige al frontend; el resultado viaja en la query del Location
     assert res.status_code in (301, 302)
-    assert "missing_token" in res.headers["Location"]
+    assert expected in res.headers["Location"]